@@ -1,4 +1,12 @@
-from uberduck_ml_dev.models.common import MelSTFT
+from uberduck_ml_dev.data.hifigan import mel_spectrogram as hifigan_mel_spectrogram
+from uberduck_ml_dev.models.common import MelSTFT, STFT
+from uberduck_ml_dev.models.spectral import (
+    WINDOW_NORMALIZATION_CACHE_SIZE,
+    _window_normalization,
+    get_mel_stft,
+    mel_filterbank,
+    stft_window,
+)
 import torch
 
 
@@ -8,3 +16,58 @@ class TestCommon:
         mel = mel_stft.mel_spectrogram(torch.clip(torch.randn(1, 1000), -1, 1))
         assert mel.shape[0] == 1
         assert mel.shape[1] == 80
+
+    def test_spectral_cache(self):
+        stft = STFT()
+        assert STFT().forward_basis is stft.forward_basis
+        assert MelSTFT().mel_basis is MelSTFT().mel_basis
+        assert mel_filterbank(fmax=8000) is mel_filterbank(fmax=8000.0)
+        assert mel_filterbank(fmax=None) is not mel_filterbank(fmax=8000)
+        assert mel_filterbank().dtype == torch.float32
+        assert mel_filterbank(dtype=torch.float64).dtype == torch.float64
+        assert stft_window(win_length=512) is not stft_window(win_length=1024)
+        assert get_mel_stft() is get_mel_stft()
+
+        # NOTE: the HiFi-GAN loss mel uses a filterbank per fmax, also after the first call.
+        y = torch.clip(torch.randn(1, 8192) * 0.1, -1, 1)
+        mels = [
+            hifigan_mel_spectrogram(y, 1024, 80, 22050, 256, 1024, 0, fmax)
+            for fmax in [8000, None]
+        ]
+        assert not torch.allclose(mels[0], mels[1])
+
+        stft = STFT()
+        for n_samples in range(
+            4096, 4096 + 256 * 2 * WINDOW_NORMALIZATION_CACHE_SIZE, 256
+        ):
+            stft.inverse(*stft.transform(torch.zeros(1, n_samples)))
+        cache_info = _window_normalization.cache_info()
+        assert cache_info.currsize <= WINDOW_NORMALIZATION_CACHE_SIZE
+
+    def test_stft_backends(self):
+        audio = torch.clip(torch.randn(2, 8000) * 0.3, -1, 1)
+        conv, fft = STFT(), STFT(backend="fft")
+        magnitude, phase = conv.transform(audio)
+        magnitude_fft, phase_fft = fft.transform(audio)
+        assert magnitude_fft.shape == magnitude.shape
+        assert torch.allclose(magnitude_fft, magnitude, atol=1e-3)
+        reconstruction = conv.inverse(magnitude, phase)
+        reconstruction_fft = fft.inverse(magnitude_fft, phase_fft)
+        assert reconstruction_fft.shape == reconstruction.shape
+        assert torch.allclose(reconstruction_fft, reconstruction, atol=1e-5)
+        assert torch.allclose(reconstruction_fft[:, 0], audio[:, :7936], atol=1e-5)
+
+    def test_batched_griffin_lim(self):
+        mel_stft = MelSTFT()
+        audio = torch.clip(torch.randn(2, 8000) * 0.3, -1, 1)
+        mels = mel_stft.mel_spectrogram(audio)
+        torch.manual_seed(0)
+        single = mel_stft.griffin_lim(mels[0], n_iters=4, momentum=0.99)
+        torch.manual_seed(0)
+        lengths = torch.tensor([mels.size(2), 10])
+        batch = mel_stft.griffin_lim(mels, n_iters=4, momentum=0.99, lengths=lengths)
+        assert single.shape == (1, (mels.size(2) - 1) * 256)
+        assert batch.shape == (2, single.size(1))
+        assert torch.allclose(batch[0], single[0], atol=1e-4)
+        assert batch[1, 9 * 256 :].abs().max() == 0
+        assert batch[1, : 9 * 256].abs().max() > 0
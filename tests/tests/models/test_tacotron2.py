@@ -6,7 +6,14 @@ import torch
 import numpy as np
 
 from uberduck_ml_dev.text.utils import prepare_input_sequence
-from uberduck_ml_dev.models.tacotron2 import Tacotron2, INFERENCE, LEFT_TEACHER_FORCED
+from uberduck_ml_dev.models.tacotron2 import (
+    Tacotron2,
+    INFERENCE,
+    LEFT_TEACHER_FORCED,
+    DEFAULTS as TACOTRON2_DEFAULTS,
+)
+from uberduck_ml_dev.models.components.decoders.tacotron2 import Decoder
+from uberduck_ml_dev.utils.utils import get_mask_from_lengths
 from uberduck_ml_dev.trainer.tacotron2 import (
     Tacotron2Trainer,
     DEFAULTS as TACOTRON2_TRAINER_DEFAULTS,
@@ -225,3 +232,115 @@ class TestTacotron2Model:
         vectors = np.asarray([original_vector_beginning, tf_estimate_vector_beginning])
         rho_beginning = np.corrcoef(vectors)
         assert rho_beginning[0, 1] > 0.98
+
+    def test_compact_inference(self):
+        class StoppingDecoder(Decoder):
+            # NOTE: each row stops at the step stored in its first memory value.
+            def initialize_decoder_states(self, memory, mask):
+                super().initialize_decoder_states(memory, mask)
+                self.n_steps = 0
+
+            def decode(self, decoder_input, attention_weights):
+                mel_output, gate_output, alignment = super().decode(
+                    decoder_input, attention_weights
+                )
+                self.n_steps += 1
+                stop = self.memory[:, 0, :1] <= self.n_steps
+                return mel_output, gate_output - 20 + 40 * stop, alignment
+
+        decoders = []
+        for compact_inference in [False, True]:
+            config = TACOTRON2_DEFAULTS.values()
+            config.update(max_decoder_steps=40, compact_inference=compact_inference)
+            torch.manual_seed(0)
+            decoder = StoppingDecoder(HParams(**config)).eval()
+            decoder.prenet.dropout_rate = 0.0
+            decoders.append(decoder)
+        memory = torch.randn(3, 10, 512) * 0.1
+        memory[:, 0, 0] = torch.tensor([12.0, 30.0, 5.0])
+        memory_lengths = torch.tensor([8, 10, 6])
+        with torch.no_grad():
+            full, compact = [d.inference(memory, memory_lengths) for d in decoders]
+        assert compact[3].tolist() == full[3].tolist() == [11, 29, 4]
+        assert compact[0].shape == full[0].shape == (3, 80, 30)
+        mask = torch.arange(30)[None] < compact[3][:, None]
+        assert torch.allclose(
+            full[0] * mask[:, None], compact[0] * mask[:, None], atol=1e-5
+        )
+        assert torch.allclose(
+            full[2] * mask[..., None], compact[2] * mask[..., None], atol=1e-5
+        )
+        assert (compact[1][~mask] >= 0).all()
+        assert (compact[0][2, :, 5:] == 0).all()
+
+    def test_decoder_inference_buffers(self):
+        def reference_inference(decoder, memory, memory_lengths):
+            # NOTE: the list-and-stack loop Decoder.inference used before its outputs were preallocated.
+            n_frames = decoder.n_frames_per_step_current
+            decoder_input = decoder.get_go_frame(memory)
+            decoder.initialize_decoder_states(
+                memory, mask=~get_mask_from_lengths(memory_lengths)
+            )
+            mel_outputs, gate_outputs, alignments = [], [], []
+            mel_lengths = torch.zeros(memory.size(0), dtype=torch.int32)
+            not_finished = torch.ones(memory.size(0), dtype=torch.int32)
+            while True:
+                decoder_input = decoder.prenet(decoder_input)
+                mel_output, gate_output, alignment = decoder.decode(decoder_input, None)
+                mel_output = mel_output[:, : decoder.n_mel_channels * n_frames]
+                mel_outputs += [mel_output]
+                gate_outputs += [gate_output.squeeze(1)] * n_frames
+                alignments += [alignment]
+                dec = torch.le(torch.sigmoid(gate_output), decoder.gate_threshold)
+                not_finished = not_finished * dec.to(torch.int32).squeeze(1)
+                mel_lengths += not_finished
+                if (
+                    not_finished.sum() == 0
+                    or len(mel_outputs) == decoder.max_decoder_steps
+                ):
+                    break
+                decoder_input = mel_output[:, -decoder.n_mel_channels :]
+            return decoder.parse_decoder_outputs(
+                torch.stack(mel_outputs, dim=1), gate_outputs, alignments
+            ) + (mel_lengths,)
+
+        # NOTE: the seeds and thresholds below 1 stop every row early, at different steps, and a
+        # gate_threshold above 1 never stops, so decoding runs to max_decoder_steps.
+        for n_frames_per_step, seed, gate_threshold in [
+            (1, 1, 0.55),
+            (1, 1, 1.1),
+            (3, 9, 0.5),
+            (3, 9, 1.1),
+        ]:
+            config = TACOTRON2_DEFAULTS.values()
+            config.update(
+                n_mel_channels=8,
+                n_frames_per_step_initial=n_frames_per_step,
+                encoder_embedding_dim=16,
+                attention_rnn_dim=32,
+                decoder_rnn_dim=32,
+                prenet_dim=16,
+                attention_dim=8,
+                attention_location_n_filters=4,
+                attention_location_kernel_size=3,
+                max_decoder_steps=25,
+                gate_threshold=gate_threshold,
+            )
+            torch.manual_seed(seed)
+            decoder = Decoder(HParams(**config)).eval()
+            decoder.prenet.dropout_rate = 0.0
+            torch.manual_seed(0)
+            memory = torch.randn(3, 7, 16)
+            memory_lengths = torch.tensor([7, 5, 3])
+            with torch.no_grad():
+                outputs = decoder.inference(memory, memory_lengths)
+                expected = reference_inference(decoder, memory, memory_lengths)
+            if gate_threshold > 1:
+                assert outputs[0].shape == (3, 8, 25 * n_frames_per_step)
+                assert outputs[3].tolist() == [25, 25, 25]
+            else:
+                assert outputs[0].size(2) < 25 * n_frames_per_step
+                assert len(set(outputs[3].tolist())) == 3
+            for output, expected_output in zip(outputs, expected):
+                assert output.shape == expected_output.shape
+                assert torch.equal(output, expected_output)
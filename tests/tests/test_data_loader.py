@@ -1,8 +1,31 @@
+import multiprocessing
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pytest
+import torch
 from torch.utils.data import DataLoader
 
 from uberduck_ml_dev.data.utils import oversample
 from uberduck_ml_dev.data.data import Data
+from uberduck_ml_dev.data.batch import Batch
+from uberduck_ml_dev.data.batched_mel import BatchedMel
 from uberduck_ml_dev.data.collate import Collate
+from uberduck_ml_dev.data.loader import DevicePrefetcher
+from uberduck_ml_dev.data.manifest import write_manifest
+from uberduck_ml_dev.data.store import MemmapStore
+from uberduck_ml_dev.data.streaming import StreamingData
+from uberduck_ml_dev.exec.gather_dataset import _gather
+from uberduck_ml_dev.data.sampler import (
+    BucketBatchSampler,
+    FrameBudgetBatchSampler,
+    WeightedSampler,
+)
+from uberduck_ml_dev.utils.utils import load_filepaths_and_text
+from uberduck_ml_dev.exec.precompute_f0s import run as precompute_f0s
+from uberduck_ml_dev.exec.precompute_mels import run as precompute_mels
 
 
 class TestTextMelCollation:
@@ -73,3 +96,269 @@ class TestTextMelCollation:
             )  # I'm not sure why this was 570 - maybe 566 + 5 (i.e. the n_frames_per_step)
             assert batch["gate_target"].size(1) == 566
             assert len(batch) == 9
+
+    def test_collate_buffers(self):
+
+        ds = Data(
+            "tests/fixtures/val.txt",
+            debug=True,
+            debug_dataset_size=12,
+            symbol_set="default",
+        )
+        samples = [ds[0], ds[0]]
+        samples[1]["mel"] = samples[1]["mel"][:, :100]
+        expected = Collate()(samples)
+        with pytest.deprecated_call():
+            Collate(cudnn_enabled=True)
+        collate_fn = Collate(n_buffers=2)
+        for _ in range(3):
+            batch = collate_fn(samples)
+            for k, v in expected.items():
+                if v is not None:
+                    assert torch.equal(batch[k], v)
+        assert expected["gate_target"][1, 98] == 0
+        assert expected["gate_target"][1, 99:].all()
+        assert not expected["mel_padded"][1, :, 100:].any()
+
+    def test_worker_loader(self):
+
+        ds = Data(
+            "tests/fixtures/val.txt",
+            debug=True,
+            debug_dataset_size=12,
+            symbol_set="default",
+        )
+        dl = DataLoader(
+            ds,
+            12,
+            collate_fn=Collate(),
+            num_workers=2,
+            persistent_workers=True,
+            prefetch_factor=2,
+        )
+        dl = DevicePrefetcher(dl, "cpu")
+        for epoch in range(2):
+            batches = list(dl)
+            assert len(batches) == len(dl) == 1
+            assert isinstance(batches[0], Batch)
+            assert batches[0]["mel_padded"].size(2) == 566
+
+    def test_sampling_rate_mismatch(self):
+
+        ds = Data(
+            "tests/fixtures/val.txt",
+            symbol_set="default",
+            sampling_rate=16000,
+        )
+        with pytest.raises(ValueError):
+            ds[0]
+
+    def test_streaming_data(self, tmp_path):
+
+        audiopath, text, speaker_id = load_filepaths_and_text("tests/fixtures/val.txt")[
+            0
+        ]
+        lines = []
+        for i in range(3):
+            os.makedirs(tmp_path / f"speaker{i}")
+            shutil.copy(audiopath, tmp_path / f"speaker{i}" / "1.wav")
+            lines.append(f"{tmp_path / f'speaker{i}' / '1.wav'}|{text}|{i}\n")
+        with open(tmp_path / "list.txt", "w") as f:
+            f.writelines(lines)
+        archives = [str(tmp_path / "data.zip"), str(tmp_path / "data.tar")]
+        for archive in archives:
+            _gather(str(tmp_path / "list.txt"), archive)
+
+        ds = StreamingData(archives, shuffle_buffer_size=2, symbol_set="default")
+        assert len(ds) == 6
+        for num_workers in [0, 3]:
+            dl = DataLoader(ds, 2, collate_fn=Collate(), num_workers=num_workers)
+            batches = list(dl)
+            speaker_ids = torch.cat([batch["speaker_ids"] for batch in batches])
+            assert sorted(speaker_ids.tolist()) == [0, 0, 1, 1, 2, 2]
+            assert batches[0]["mel_padded"].size(2) == 566
+
+    def test_load_mels(self, tmp_path):
+
+        store = precompute_mels(["tests/fixtures/val.txt"], str(tmp_path))
+        assert len(store) == 1
+        ds = Data(
+            "tests/fixtures/val.txt",
+            symbol_set="default",
+        )
+        ds_cached = Data(
+            "tests/fixtures/val.txt",
+            symbol_set="default",
+            load_mels=True,
+            mel_cache_path=str(tmp_path),
+        )
+        mel = ds[0]["mel"]
+        mel_cached = ds_cached[0]["mel"]
+        assert mel_cached.shape == (80, 566)
+        assert torch.allclose(mel, mel_cached)
+
+    def test_batched_mel(self):
+
+        ds = Data(
+            "tests/fixtures/val.txt",
+            symbol_set="default",
+            batch_mels=True,
+        )
+        item = ds[0]
+        assert "mel" not in item
+        short = dict(item, audio=item["audio"][:50000])
+        batch = Collate()([item, short])
+        assert batch["audio_padded"].shape == (2, len(item["audio"]))
+        batch = next(iter(DevicePrefetcher([batch], transform=BatchedMel())))
+        assert "audio_padded" not in batch
+        assert batch["output_lengths"].tolist() == [566, 196]
+        for i, audio in enumerate([item["audio"], short["audio"]]):
+            mel = ds._get_mel(audio[None])
+            n = mel.size(1)
+            assert torch.allclose(batch["mel_padded"][i, :, :n], mel, atol=1e-4)
+            assert (batch["mel_padded"][i, :, n:] == 0).all()
+            assert batch["gate_target"][i, n - 1 :].all()
+            assert not batch["gate_target"][i, : n - 1].any()
+
+    def test_sample_weights(self):
+
+        ds = Data(
+            "tests/fixtures/val.txt",
+            symbol_set="default",
+            oversample_weights={"0": 2.5},
+        )
+        assert len(ds) == 1
+        assert list(ds.get_sample_weights()) == [2.5]
+
+    def test_mel_lengths(self):
+
+        ds = Data(
+            "tests/fixtures/val.txt",
+            symbol_set="default",
+        )
+        assert list(ds.get_mel_lengths()) == [ds[0]["mel"].size(1)]
+
+
+class TestSamplers:
+    def test_bucket_batch_sampler(self):
+
+        lengths = [5, 100, 7, 98, 6, 99, 8, 97, 50]
+        sampler = BucketBatchSampler(lengths, batch_size=2, n_batches_per_bucket=1)
+        batches = list(sampler)
+        assert len(batches) == len(sampler) == 5
+        assert sorted(sum(batches, [])) == list(range(len(lengths)))
+        for batch in batches:
+            batch_lengths = [lengths[i] for i in batch]
+            assert max(batch_lengths) - min(batch_lengths) <= 47
+        sampler.set_epoch(1)
+        assert sorted(sum(list(sampler), [])) == list(range(len(lengths)))
+
+    def test_frame_budget_batch_sampler(self):
+
+        lengths = [5, 100, 7, 98, 6, 99, 8, 97, 50, 300]
+        sampler = FrameBudgetBatchSampler(lengths, max_frames=200)
+        batches = list(sampler)
+        assert len(batches) == len(sampler)
+        assert sorted(sum(batches, [])) == list(range(len(lengths)))
+        assert [9] in batches
+        for batch in batches:
+            if len(batch) > 1:
+                assert len(batch) * max(lengths[i] for i in batch) <= 200
+
+    def test_weighted_sampler(self):
+
+        sampler = WeightedSampler([1, 1, 3])
+        assert len(sampler) == 5
+        assert sorted(sampler) == [0, 1, 2, 2, 2]
+
+        weights = [1, 0.5, 2.5]
+        sampler = WeightedSampler(weights, num_samples=7)
+        counts = np.zeros(3)
+        for epoch in range(200):
+            sampler.set_epoch(epoch)
+            indices = list(sampler)
+            assert len(indices) == 7
+            counts += np.bincount(indices, minlength=3)
+        assert np.allclose(counts / 200, [1.75, 0.875, 4.375], atol=0.1)
+
+        lengths = [5, 100, 7]
+        sampler = BucketBatchSampler(
+            lengths, batch_size=2, weights=weights, num_samples=8
+        )
+        assert len(sampler) == len(list(sampler)) == 4
+        sampler = FrameBudgetBatchSampler(lengths, max_frames=100, weights=[1, 0, 2])
+        assert sorted(sum(list(sampler), [])) == [0, 2, 2]
+        sampler.set_epoch(1)
+        assert len(list(sampler)) == len(sampler)
+
+    def test_num_samples(self):
+
+        lengths = list(range(1, 101))
+        for weights in [None, np.ones(100)]:
+            sampler = BucketBatchSampler(
+                lengths, batch_size=4, weights=weights, num_samples=200
+            )
+            assert len(sampler) == len(list(sampler)) == 50
+            sampler = FrameBudgetBatchSampler(
+                lengths, max_frames=200, weights=weights, num_samples=200
+            )
+            assert len(sampler) == len(list(sampler))
+            assert len(sum(list(sampler), [])) == 200
+
+
+class TestManifest:
+    def test_manifest(self, tmp_path):
+
+        manifest = write_manifest("tests/fixtures/val.txt", str(tmp_path / "val"))
+        assert len(manifest) == 1
+        assert manifest[0] == load_filepaths_and_text("tests/fixtures/val.txt")[0]
+        assert manifest.text_lengths[0] == len(manifest.texts[0])
+        manifest = pickle.loads(pickle.dumps(manifest))
+        assert manifest.speaker_ids[0] == 0
+
+        ds = Data(str(tmp_path / "val"), symbol_set="default")
+        expected = Data("tests/fixtures/val.txt", symbol_set="default")
+        assert list(ds.get_mel_lengths()) == list(expected.get_mel_lengths())
+        assert torch.equal(ds[0]["mel"], expected[0]["mel"])
+        assert ds[0]["speaker_id"] == expected[0]["speaker_id"]
+
+
+def _append_entries(path, keys):
+    store = MemmapStore(path, mode="a")
+    for key in keys:
+        store.append(key, np.full((int(key), 3), int(key), dtype=np.float32))
+
+
+class TestStores:
+    def test_concurrent_writers(self, tmp_path):
+
+        path = str(tmp_path / "store")
+        store = MemmapStore(path, n_channels=3, mode="a")
+        processes = [
+            multiprocessing.Process(target=_append_entries, args=(path, keys))
+            for keys in [["1", "3", "5"], ["2", "4", "6"]]
+        ]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        store.refresh()
+        assert len(store) == 6
+        for key in store.keys():
+            assert (store[key] == int(key)).all()
+            assert store[key].shape == (int(key), 3)
+
+    def test_f0_store(self, tmp_path):
+
+        store = precompute_f0s(["tests/fixtures/val.txt"], str(tmp_path), num_workers=2)
+        assert len(store) == 1
+        ds = Data(
+            "tests/fixtures/val.txt",
+            symbol_set="default",
+            return_f0s=True,
+            f0_cache_path=str(tmp_path),
+        )
+        f0 = ds[0]["f0"]
+        assert len(ds.f0_store) == 1
+        assert torch.equal(ds[0]["f0"], f0)
+        assert f0.size(0) == ds[0]["mel"].size(1)
@@ -1,6 +1,10 @@
+import random
+
 from uberduck_ml_dev.text.utils import (
     cleaned_text_to_sequence,
     text_to_sequence,
+    text_to_alternatives,
+    sample_alternatives,
     DEFAULT_SYMBOLS,
     sequence_to_text,
 )
@@ -107,3 +111,29 @@ class TestTextUtils:
             86,
             86,
         ]
+
+    def test_text_alternatives(self):
+        texts = [
+            "Not bad bart, not bad at all, Dr. Smith paid $42.",
+            "{N AA1 T} {B AE1 D} {B AA1 R T}, not bad {AE1 T} all.",
+            "",
+        ]
+        for text in texts:
+            alternatives = text_to_alternatives(
+                text, ["english_cleaners"], DEFAULT_SYMBOLS, with_arpabet=False
+            )
+            for seed in range(3):
+                random.seed(seed)
+                expected = text_to_sequence(
+                    text, ["english_cleaners"], 0.0, DEFAULT_SYMBOLS
+                )
+                random.seed(seed)
+                assert sample_alternatives(alternatives, 0.0).tolist() == expected, text
+
+        # NOTE: embedded ARPAbet has a single form, so g2p is never needed here.
+        text = "{N AA1 T} {B AE1 D}."
+        alternatives = text_to_alternatives(text, ["english_cleaners"], DEFAULT_SYMBOLS)
+        assert all(arpabet is None for _, arpabet, _ in alternatives)
+        assert sample_alternatives(alternatives, 1.0).tolist() == text_to_sequence(
+            text, ["english_cleaners"], 1.0, DEFAULT_SYMBOLS
+        )
@@ -1,5 +1,15 @@
+import numpy as np
 import torch
-from uberduck_ml_dev.utils.utils import get_mask_from_lengths, sequence_mask
+from types import SimpleNamespace
+
+from uberduck_ml_dev.utils.audio import batched_yin
+from uberduck_ml_dev.utils.denoiser import Denoiser
+from uberduck_ml_dev.utils.utils import (
+    get_mask_from_lengths,
+    sequence_mask,
+    window_sumsquare,
+    window_sumsquare_torch,
+)
 
 
 class TestUtils:
@@ -41,3 +51,51 @@ class TestUtils:
                 ]
             )
         ).all()
+
+    def test_batched_yin(self):
+
+        sr = 22050
+        t = np.arange(sr) / sr
+        tones = np.stack([np.sin(2 * np.pi * 220 * t), np.sin(2 * np.pi * 150 * t)])
+        f0, voiced_mask, p_voiced = batched_yin(tones, sr)
+        assert f0.shape == voiced_mask.shape == p_voiced.shape == (2, 1 + sr // 256)
+        assert voiced_mask[:, 2:-2].all()
+        assert torch.allclose(f0[0, 2:-2], torch.tensor(220.0), rtol=0.01)
+        assert torch.allclose(f0[1, 2:-2], torch.tensor(150.0), rtol=0.01)
+        single = batched_yin(tones[1], sr)[0]
+        assert torch.allclose(single, f0[1])
+
+    def test_window_sumsquare(self):
+        # NOTE: the per-frame overlap-add of librosa 0.6.
+        window = np.hanning(801)[:800] ** 2
+        for n_frames, hop_length in [(1, 200), (13, 200), (13, 300)]:
+            expected = np.zeros(800 + hop_length * (n_frames - 1), dtype=np.float32)
+            for i in range(n_frames):
+                expected[i * hop_length : i * hop_length + 800] += window
+            wss = window_sumsquare("hann", n_frames, hop_length=hop_length)
+            assert np.allclose(wss, expected, atol=1e-5)
+            assert wss is window_sumsquare("hann", n_frames, hop_length=hop_length)
+            assert not wss.flags.writeable
+            wss_torch = window_sumsquare_torch("hann", n_frames, hop_length=hop_length)
+            assert np.allclose(wss_torch.numpy(), expected, atol=1e-5)
+
+        wss = window_sumsquare(("tukey", 0.5), 13, hop_length=200)
+        assert wss is window_sumsquare(("tukey", 0.5), 13, hop_length=200)
+        assert not np.allclose(wss, window_sumsquare("hann", 13, hop_length=200))
+
+    def test_denoiser_stream(self):
+        vocoder = lambda mel: torch.ones(1, 1, mel.size(2) * 256) * 0.01
+        hifigan = SimpleNamespace(
+            vocoder=SimpleNamespace(forward=vocoder), device="cpu"
+        )
+        denoiser = Denoiser(hifigan)
+        audio = torch.randn(1, 5000) * 0.3
+        expected = denoiser(audio, strength=10)[:, 0]
+        stream = denoiser.stream(strength=10)
+        chunks = [stream(chunk) for chunk in audio.split(300, dim=1)]
+        output = torch.cat(chunks + [stream.flush()], dim=1)
+        assert output.shape == audio.shape
+        assert torch.allclose(output[:, : expected.size(1)], expected, atol=1e-5)
+        stream = denoiser.stream()
+        stream(torch.zeros(2, 0))
+        assert stream.flush().shape == (2, 0)
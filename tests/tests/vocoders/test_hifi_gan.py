@@ -1,4 +1,14 @@
+import multiprocessing
+import random
+import os
+
+from librosa.util import normalize
+import numpy as np
 from scipy.io.wavfile import read
+from uberduck_ml_dev.data.audio_cache import SharedAudioCache
+from uberduck_ml_dev.data.hifigan import MelDataset
+from uberduck_ml_dev.exec.pack_mels import run as pack_mels
+from uberduck_ml_dev.exec.precompute_peaks import run as precompute_peaks
 from uberduck_ml_dev.models.common import MelSTFT
 import torch
 
@@ -20,3 +30,152 @@ class TestHifiGan:
         assert mel.shape[0] == 1
         assert mel.shape[1] == 80
         assert mel.shape[2] == 566
+
+    def test_mel_dataset_segments(self, tmp_path):
+
+        path = "tests/fixtures/wavs/stevejobs-1.wav"
+        _, data = read(path)
+        expected_audio = normalize(data / 32768.0) * 0.95
+
+        with open(tmp_path / "list.txt", "w") as f:
+            f.write(f"{path}|text|0\n")
+        peaks = precompute_peaks([str(tmp_path / "list.txt")], str(tmp_path / "p.json"))
+        assert peaks == {path: float(np.abs(data.astype(np.int64)).max())}
+
+        for peak_table in [None, str(tmp_path / "p.json")]:
+            dataset = MelDataset(
+                [path],
+                8192,
+                1024,
+                80,
+                256,
+                1024,
+                22050,
+                0,
+                8000,
+                n_cache_reuse=0,
+                peak_table=peak_table,
+            )
+            data_mmap, scale = dataset._load_audio(path)
+            assert isinstance(data_mmap, np.memmap)
+            for start in [0, 1000, len(data) - 8192]:
+                audio = dataset._read_segment(data_mmap, scale, start, start + 8192)
+                assert audio.shape == (1, 8192)
+                assert np.allclose(
+                    audio[0].numpy(), expected_audio[start : start + 8192], atol=1e-6
+                )
+            assert dataset.peaks == peaks
+
+    def test_shared_audio_cache(self):
+
+        cache = SharedAudioCache(max_bytes=4 * 1000, max_entries=8)
+        worker = multiprocessing.Process(
+            target=cache.put, args=("a", torch.arange(400, dtype=torch.float32))
+        )
+        worker.start()
+        worker.join()
+        assert torch.equal(cache.get("a"), torch.arange(400, dtype=torch.float32))
+        assert cache.get("b") is None
+        cache.put("b", torch.ones(400))
+        # NOTE: "a" is in the older half of the ring, so this hit appends it again and "b" is evicted next.
+        assert cache.get("a") is not None
+        cache.put("c", torch.zeros(400))
+        assert cache.get("b") is None
+        assert torch.equal(cache.get("a"), torch.arange(400, dtype=torch.float32))
+        assert torch.equal(cache.get("c"), torch.zeros(400))
+        cache.put("too long", torch.zeros(1001))
+        assert cache.get("too long") is None
+        assert (cache.hits, cache.misses) == (4, 3)
+
+        path = "tests/fixtures/wavs/stevejobs-1.wav"
+        cache = SharedAudioCache(max_bytes=2**22)
+        args = [[path], 8192, 1024, 80, 256, 1024, 22050, 0, 8000]
+        dataset = MelDataset(*args, n_cache_reuse=0)
+        cached_dataset = MelDataset(*args, n_cache_reuse=0, audio_cache=cache)
+        for _ in range(2):
+            data, scale = dataset._load_audio(path)
+            cached_data, cached_scale = cached_dataset._load_audio(path)
+            assert cached_scale == 1.0
+            assert np.allclose(
+                dataset._read_segment(data, scale, 100, 8292),
+                cached_dataset._read_segment(cached_data, cached_scale, 100, 8292),
+            )
+        assert cache.hit_rate == 0.5
+
+    def test_mel_store(self, tmp_path):
+
+        path = "tests/fixtures/wavs/stevejobs-1.wav"
+        mel = np.random.randn(1, 80, 566).astype(np.float32)
+        os.makedirs(tmp_path / "mels" / "tests/fixtures/wavs")
+        np.save(tmp_path / "mels" / "tests/fixtures/wavs/stevejobs-1.npy", mel)
+        with open(tmp_path / "list.txt", "w") as f:
+            f.write(f"{path}|text|0\n")
+        store = pack_mels(
+            [str(tmp_path / "list.txt")],
+            str(tmp_path / "mels"),
+            str(tmp_path / "store"),
+        )
+        assert len(store) == 1
+
+        args = [[path], 8192, 1024, 80, 256, 1024, 22050, 0, 8000]
+        for base_mels_path in [tmp_path / "mels", tmp_path / "store"]:
+            dataset = MelDataset(
+                *args, fine_tuning=True, base_mels_path=str(base_mels_path)
+            )
+            assert (dataset.mel_store is None) == (base_mels_path == tmp_path / "mels")
+            view = dataset._load_mel(path)
+            assert view.shape == (1, 80, 566)
+            assert np.array_equal(np.array(view[:, :, 100:132]), mel[:, :, 100:132])
+
+    def test_mel_dataset_getitem(self, tmp_path):
+
+        path = "tests/fixtures/wavs/stevejobs-1.wav"
+        _, data = read(path)
+        # NOTE: the normalization MelDataset used before reading segments from memory-mapped audio.
+        expected = {
+            False: normalize(data / 32768.0) * 0.95,
+            True: data / 32768.0,
+        }
+        mel = np.random.randn(1, 80, 566).astype(np.float32)
+        os.makedirs(tmp_path / "mels" / "tests/fixtures/wavs")
+        np.save(tmp_path / "mels" / "tests/fixtures/wavs/stevejobs-1.npy", mel)
+        with open(tmp_path / "list.txt", "w") as f:
+            f.write(f"{path}|text|0\n")
+        precompute_peaks([str(tmp_path / "list.txt")], str(tmp_path / "p.json"))
+
+        args = [[path], 8192, 1024, 80, 256, 1024, 22050, 0, 8000]
+        for fine_tuning in [False, True]:
+            for peak_table in [None, str(tmp_path / "p.json")]:
+                for split in [True, False]:
+                    dataset = MelDataset(
+                        *args,
+                        split=split,
+                        n_cache_reuse=0,
+                        fine_tuning=fine_tuning,
+                        base_mels_path=str(tmp_path / "mels"),
+                        peak_table=peak_table,
+                    )
+                    random.seed(0)
+                    mel_item, audio, filename, mel_loss = dataset[0]
+                    assert filename == path
+                    if not split:
+                        start = 0
+                        assert audio.shape == (len(data),)
+                    elif fine_tuning:
+                        random.seed(0)
+                        start = random.randint(0, 566 - 32 - 1) * 256
+                        assert torch.equal(
+                            mel_item,
+                            torch.from_numpy(mel[0, :, start // 256 :][:, :32]),
+                        )
+                    else:
+                        random.seed(0)
+                        start = random.randint(0, len(data) - 8192)
+                    if split:
+                        assert audio.shape == (8192,)
+                    assert np.allclose(
+                        audio.numpy(),
+                        expected[fine_tuning][start : start + len(audio)],
+                        atol=1e-6,
+                    )
+                    assert mel_loss.shape[0] == 80
@@ -0,0 +1,105 @@
+__all__ = ["SharedAudioCache"]
+
+import hashlib
+import multiprocessing
+
+import torch
+
+KEY, START, LENGTH, READY = range(4)
+HEAD, N_PUTS, HITS, MISSES = range(4)
+
+
+def _key_hash(key: str):
+    return int.from_bytes(
+        hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(),
+        "little",
+        signed=True,
+    )
+
+
+class SharedAudioCache:
+    """Bounded cache of decoded float32 audio shared by all DataLoader workers.
+
+    Audio is appended to a ring of max_bytes in shared memory and entries are evicted when the ring wraps
+    over them (or when more than max_entries are stored). A hit on an entry in the older half of the ring
+    appends it again, so frequently used audio stays cached, approximating least-recently-used eviction.
+    Create the cache in the main process before the workers start; the index and hit counts are shared too,
+    so hit_rate covers all workers.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = 4096):
+        self.capacity = max_bytes // 4
+        self.max_entries = max_entries
+        self.arena = torch.empty(self.capacity, dtype=torch.float32).share_memory_()
+        self.entries = torch.zeros((max_entries, 4), dtype=torch.int64).share_memory_()
+        self.state = torch.zeros(4, dtype=torch.int64).share_memory_()
+        self.lock = multiprocessing.Lock()
+
+    @property
+    def hits(self):
+        return int(self.state[HITS])
+
+    @property
+    def misses(self):
+        return int(self.state[MISSES])
+
+    @property
+    def hit_rate(self):
+        n = self.hits + self.misses
+        return self.hits / n if n else 0.0
+
+    def _find(self, key_hash):
+        # NOTE: entries the ring has wrapped over are stale, and the newest copy of a key wins.
+        head = int(self.state[HEAD])
+        valid = (
+            (self.entries[:, KEY] == key_hash)
+            & (self.entries[:, READY] == 1)
+            & (self.entries[:, START] >= head - self.capacity)
+        )
+        if not valid.any():
+            return None
+        starts = torch.where(valid, self.entries[:, START], -1)
+        return int(starts.argmax())
+
+    def get(self, key: str):
+        """Return a copy of the cached audio of key, or None."""
+        key_hash = _key_hash(key)
+        with self.lock:
+            slot = self._find(key_hash)
+            if slot is None:
+                self.state[MISSES] += 1
+                return None
+            self.state[HITS] += 1
+            start, length = self.entries[slot, START : LENGTH + 1].tolist()
+            offset = start % self.capacity
+            # NOTE: copied under the lock so that no writer can claim the region meanwhile.
+            audio = self.arena[offset : offset + length].clone()
+            stale = start < int(self.state[HEAD]) - self.capacity // 2
+        if stale:
+            self._put(key_hash, audio)
+        return audio
+
+    def put(self, key: str, audio: torch.Tensor):
+        """Cache a 1d float32 tensor of audio under key. Audio larger than the cache is not cached."""
+        self._put(_key_hash(key), audio)
+
+    def _put(self, key_hash, audio):
+        length = audio.numel()
+        if length > self.capacity:
+            return
+        with self.lock:
+            start = int(self.state[HEAD])
+            if start % self.capacity + length > self.capacity:
+                start += self.capacity - start % self.capacity
+            self.state[HEAD] = start + length
+            slot = int(self.state[N_PUTS]) % self.max_entries
+            self.state[N_PUTS] += 1
+            self.entries[slot] = torch.tensor([key_hash, start, length, 0])
+        offset = start % self.capacity
+        self.arena[offset : offset + length].copy_(audio.reshape(-1))
+        with self.lock:
+            if (
+                int(self.entries[slot, KEY]) == key_hash
+                and int(self.entries[slot, START]) == start
+            ):
+                self.entries[slot, READY] = 1
@@ -1,5 +1,7 @@
 from typing import Dict
 
+import torch
+
 from ..utils.utils import to_gpu
 
 
@@ -37,3 +39,15 @@ class Batch(Dict):
 
         batch_gpu = Batch(**{k: to_gpu(v) for k, v in self.items()})
         return batch_gpu
+
+    def to_device(self, device, non_blocking=False) -> "Batch":
+        """Move all tensors to device. Copies from pinned memory can be non_blocking."""
+
+        return Batch(
+            **{
+                k: v.to(device, non_blocking=non_blocking)
+                if isinstance(v, torch.Tensor)
+                else v
+                for k, v in self.items()
+            }
+        )
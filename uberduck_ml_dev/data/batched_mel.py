@@ -0,0 +1,119 @@
+__all__ = ["BatchedMel"]
+
+from typing import Optional
+
+import torch
+import torch.nn.functional as F
+
+from ..models.spectral import (
+    fourier_bases,
+    mel_filterbank,
+    FILTER_LENGTH,
+    HOP_LENGTH,
+    WIN_LENGTH,
+    SAMPLING_RATE,
+    N_MEL_CHANNELS,
+    MEL_FMIN,
+    MEL_FMAX,
+)
+from ..utils.utils import dynamic_range_compression
+from .batch import Batch
+
+
+class BatchedMel:
+    """Compute the mels of a collated batch of audio (Data(batch_mels=True)) in one STFT and mel matmul.
+
+    Each item is reflect-padded at its own length, exactly as MelSTFT.mel_spectrogram pads a single item,
+    so the mels and output lengths match per-item extraction. Frames past an item's length are zeroed as in Collate.
+    Apply it after the batch is on its device (e.g. DevicePrefetcher(loader, device, transform=BatchedMel(...)))
+    to compute the features on the training device.
+    """
+
+    def __init__(
+        self,
+        filter_length: int = FILTER_LENGTH,
+        hop_length: int = HOP_LENGTH,
+        win_length: int = WIN_LENGTH,
+        n_mel_channels: int = N_MEL_CHANNELS,
+        sampling_rate: int = SAMPLING_RATE,
+        mel_fmin: float = MEL_FMIN,
+        mel_fmax: float = MEL_FMAX,
+        padding: Optional[int] = None,
+    ):
+        self.filter_length = filter_length
+        self.hop_length = hop_length
+        self.win_length = win_length
+        self.n_mel_channels = n_mel_channels
+        self.sampling_rate = sampling_rate
+        self.mel_fmin = mel_fmin
+        self.mel_fmax = mel_fmax
+        self.padding = filter_length // 2 if padding is None else padding
+
+    def n_frames(self, n_samples):
+        return (
+            1 + (n_samples + 2 * self.padding - self.filter_length) // self.hop_length
+        )
+
+    def _reflect_pad(self, audio, lengths):
+        # NOTE: a single gather reflects every item at its own end instead of at the end of the padded batch.
+        idx = (
+            torch.arange(audio.size(1) + 2 * self.padding, device=audio.device)
+            - self.padding
+        )
+        idx = idx[None, :].abs().expand(audio.size(0), -1)
+        n = lengths[:, None]
+        idx = torch.where(idx >= n, 2 * (n - 1) - idx, idx).clamp(min=0)
+        return audio.gather(1, idx)
+
+    def mel_spectrogram(self, audio, lengths):
+        """Return the (B, n_mel_channels, T) mels and output lengths of (B, n_samples) audio of the given lengths."""
+        forward_basis, _ = fourier_bases(
+            self.filter_length, self.hop_length, self.win_length, device=audio.device
+        )
+        mel_basis = mel_filterbank(
+            self.sampling_rate,
+            self.filter_length,
+            self.n_mel_channels,
+            self.mel_fmin,
+            self.mel_fmax,
+            device=audio.device,
+        )
+        padded = self._reflect_pad(audio, lengths)
+        forward_transform = F.conv1d(
+            padded[:, None], forward_basis, stride=self.hop_length
+        )
+        cutoff = self.filter_length // 2 + 1
+        magnitudes = torch.sqrt(
+            forward_transform[:, :cutoff] ** 2 + forward_transform[:, cutoff:] ** 2
+        )
+        mels = dynamic_range_compression(torch.matmul(mel_basis, magnitudes))
+        output_lengths = self.n_frames(lengths)
+        mask = (
+            torch.arange(mels.size(2), device=mels.device)[None, :]
+            < output_lengths[:, None]
+        )
+        return mels * mask[:, None, :], output_lengths
+
+    def __call__(self, batch):
+        """Replace audio_padded and audio_lengths of a batch with mel_padded, output_lengths and gate_target."""
+        if batch.get("audio_padded") is None:
+            return batch
+        with torch.no_grad():
+            mels, output_lengths = self.mel_spectrogram(
+                batch["audio_padded"], batch["audio_lengths"]
+            )
+        gate_target = (
+            torch.arange(mels.size(2), device=mels.device)[None, :]
+            >= output_lengths[:, None] - 1
+        ).float()
+        output = Batch(
+            **{
+                k: v
+                for k, v in batch.items()
+                if k not in ["audio_padded", "audio_lengths"]
+            }
+        )
+        output["mel_padded"] = mels
+        output["output_lengths"] = output_lengths
+        output["gate_target"] = gate_target
+        return output
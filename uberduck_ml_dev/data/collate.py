@@ -1,16 +1,54 @@
+import warnings
+from typing import Optional
+
 import torch
 import numpy as np
 from ..data.batch import Batch
 
 
+def _pad(sequences, out):
+    """Copy sequences of shape (..., T_i) into out of shape (B, ..., T) with one indexed copy.
+
+    out is zeroed first, so the padding is 0.
+    """
+    lengths = torch.LongTensor([s.size(-1) for s in sequences])
+    starts = torch.cumsum(lengths, 0) - lengths
+    batch_idx = torch.repeat_interleave(torch.arange(len(sequences)), lengths)
+    time_idx = torch.arange(int(lengths.sum())) - torch.repeat_interleave(
+        starts, lengths
+    )
+    out.zero_()
+    out[batch_idx, ..., time_idx] = torch.cat(sequences, dim=-1).movedim(-1, 0)
+    return out
+
+
 class Collate:
     def __init__(
         self,
         n_frames_per_step: int = 1,
-        cudnn_enabled: bool = False,
+        cudnn_enabled: Optional[bool] = None,
+        n_buffers: int = 0,
+        pin_memory: bool = False,
     ):
+        """
+        PARAMS
+        ------
+        cudnn_enabled: deprecated and ignored, batches are moved to the device by DevicePrefetcher.
+        n_buffers: number of reusable sets of output buffers, 0 to allocate new tensors for every batch.
+            The tensors of a batch are overwritten n_buffers batches later, so only use buffers when
+            collating in the main process (num_workers=0) and consuming batches in order.
+        pin_memory: allocate the reusable buffers in pinned memory.
+        """
+        if cudnn_enabled is not None:
+            warnings.warn(
+                "Collate(cudnn_enabled=...) is deprecated and ignored, batches are moved to the device by data.loader.DevicePrefetcher.",
+                DeprecationWarning,
+            )
         self.n_frames_per_step = n_frames_per_step
-        self.cudnn_enabled = cudnn_enabled
+        self.n_buffers = n_buffers
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self._buffers = {}
+        self._step = 0
 
     def set_frames_per_step(self, n_frames_per_step):
         """Set n_frames_step.
@@ -23,6 +61,17 @@ class Collate:
         """
         self.n_frames_per_step = n_frames_per_step
 
+    def _empty(self, name, shape, dtype):
+        if not self.n_buffers:
+            return torch.empty(shape, dtype=dtype)
+        key = (name, self._step % self.n_buffers)
+        numel = int(np.prod(shape))
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.numel() < numel:
+            buffer = torch.empty(numel, dtype=dtype, pin_memory=self.pin_memory)
+            self._buffers[key] = buffer
+        return buffer[:numel].view(shape)
+
     # TODO (Sam): don't return None-valued keys at all.
     def __call__(self, batch):
         """Collate's training batch from normalized text and mel-spectrogram
@@ -32,40 +81,62 @@ class Collate:
 
         return_f0s = "f0" in batch[0]
         return_mels = "mel" in batch[0]
+        return_audio = "audio" in batch[0]
         return_text_sequences = "text_sequence" in batch[0]
         return_speaker_ids = "speaker_id" in batch[0]
         return_gsts = "embedded_gst" in batch[0]
         return_audio_encodings = "audio_encoding" in batch[0]
 
         if return_text_sequences:
-            input_lengths = torch.LongTensor([len(x["text_sequence"]) for x in batch])
-            max_input_len = max(input_lengths)
-            text_padded = torch.LongTensor(len(batch), max_input_len)
-            text_padded.zero_()
+            texts = [x["text_sequence"] for x in batch]
+            input_lengths = torch.LongTensor([len(x) for x in texts])
+            text_padded = _pad(
+                texts,
+                self._empty("text", (len(batch), int(input_lengths.max())), torch.long),
+            )
         else:
             text_padded = None
             input_lengths = None
         if return_mels:
-            n_mel_channels = batch[0]["mel"].size(0)
-            max_target_len = max([x["mel"].size(1) for x in batch])
-            mel_padded = torch.FloatTensor(len(batch), n_mel_channels, max_target_len)
-            mel_padded.zero_()
-            output_lengths = torch.LongTensor(len(batch))
-            gate_padded = torch.FloatTensor(len(batch), max_target_len)
-            gate_padded.zero_()
+            mels = [x["mel"] for x in batch]
+            n_mel_channels = mels[0].size(0)
+            output_lengths = torch.LongTensor([x.size(1) for x in mels])
+            max_target_len = int(output_lengths.max())
+            mel_padded = _pad(
+                mels,
+                self._empty(
+                    "mel", (len(batch), n_mel_channels, max_target_len), torch.float
+                ),
+            )
+            gate_padded = self._empty("gate", (len(batch), max_target_len), torch.float)
+            gate_padded.copy_(
+                torch.arange(max_target_len)[None, :] >= output_lengths[:, None] - 1
+            )
         else:
             mel_padded = None
             output_lengths = None
             gate_padded = None
 
+        if return_audio:
+            audios = [x["audio"] for x in batch]
+            audio_lengths = torch.LongTensor([len(x) for x in audios])
+            audio_padded = _pad(
+                audios,
+                self._empty(
+                    "audio", (len(batch), int(audio_lengths.max())), torch.float
+                ),
+            )
+
         if return_speaker_ids:
-            speaker_ids = torch.LongTensor(len(batch))
+            speaker_ids = torch.LongTensor([x["speaker_id"] for x in batch])
         else:
             speaker_ids = None
         if return_f0s:
-            max_target_len = max([x["f0"].size(0) for x in batch])
-            f0_padded = torch.FloatTensor(len(batch), 1, max_target_len)
-            f0_padded.zero_()
+            f0s = [x["f0"][None] for x in batch]
+            max_target_len = max([x.size(1) for x in f0s])
+            f0_padded = _pad(
+                f0s, self._empty("f0", (len(batch), 1, max_target_len), torch.float)
+            )
         else:
             f0_padded = None
         if return_gsts:
@@ -82,21 +153,7 @@ class Collate:
         else:
             audio_encodings = None
 
-        for i, sample in enumerate(batch):
-            if return_mels:
-                mel = sample["mel"]
-                mel_padded[i, :, : mel.size(1)] = mel
-                gate_padded[i, mel.size(1) - 1 :] = 1
-                output_lengths[i] = mel.size(1)
-            if return_speaker_ids:
-                speaker_ids[i] = sample["speaker_id"]
-            if return_f0s:
-                f0 = sample["f0"]
-                f0_padded[i, :, : f0.size(0)] = f0
-            if return_text_sequences:
-                text = sample["text_sequence"]
-                text_padded[i, : text.size(0)] = text
-
+        self._step += 1
         output = Batch(
             text_int_padded=text_padded,
             input_lengths=input_lengths,
@@ -108,6 +165,7 @@ class Collate:
             gst=embedded_gsts,
             f0=f0_padded,
         )
-        if self.cudnn_enabled:
-            output = output.to_gpu()
+        if return_audio:
+            output["audio_padded"] = audio_padded
+            output["audio_lengths"] = audio_lengths
         return output
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 import torch
 import os
 from typing import List, Optional, Dict
@@ -9,12 +10,15 @@ import numpy as np
 from librosa import pyin
 
 from ..models.common import MelSTFT
+from ..utils.audio import batched_yin
 from ..utils.utils import (
     load_filepaths_and_text,
     intersperse,
 )
-from .utils import oversample, _orig_to_dense_speaker_id
-from ..text.utils import text_to_sequence
+from .utils import _orig_to_dense_speaker_id, _wav_header
+from .manifest import Manifest
+from .store import MemmapStore, store_name
+from ..text.utils import text_to_alternatives, sample_alternatives
 from ..models.common import (
     FILTER_LENGTH,
     HOP_LENGTH,
@@ -26,6 +30,9 @@ from ..text.symbols import NVIDIA_TACO2_SYMBOLS
 
 F0_MIN = 80
 F0_MAX = 640
+PITCH_BACKENDS = ["pyin", "yin"]
+# NOTE: an entry holds small token arrays for each word of a transcript, a few KB, so up to ~50MB per worker.
+TEXT_ALTERNATIVES_CACHE_SIZE = 10000
 
 # NOTE (Sam): generic dataset class for all purposes avoids writing redundant methods (e.g. get pitch when text isn't available).
 # However, functional factorization of this dataloader (e.g. get_mels) and merging classes as needed would be preferable.
@@ -57,6 +64,9 @@ class Data(Dataset):
         symbol_set: Optional[str] = NVIDIA_TACO2_SYMBOLS,
         padding: Optional[int] = None,
         max_wav_value: Optional[float] = 32768.0,
+        load_mels: bool = False,
+        mel_cache_path: Optional[str] = None,
+        batch_mels: bool = False,
         # Pitch parameters
         # TODO (Sam): consider use_f0 = load_f0 or compute_f0
         return_f0s: bool = False,
@@ -65,6 +75,7 @@ class Data(Dataset):
         load_f0s: bool = False,
         f0_min: Optional[int] = F0_MIN,
         f0_max: Optional[int] = F0_MAX,
+        pitch_backend: str = "pyin",
         # Torchmoji parameters
         return_gsts: bool = False,
         load_gsts=False,  # TODO (Sam): check this against existing crust models
@@ -84,15 +95,19 @@ class Data(Dataset):
         self.debug = debug
         self.debug_dataset_size = debug_dataset_size
 
-        # TODO (Sam): refactor support for oversampling to make generic across data types.
+        # NOTE: rows are not duplicated, oversampling is done by a sampler with the weights of get_sample_weights.
+        self.oversample_weights = oversample_weights or {}
         # NOTE (Sam): right now only old audiopaths_and_text based loading is supported for training.
         if audiopaths_and_text:
-            oversample_weights = {}
-            self.audiopaths_and_text = oversample(
-                load_filepaths_and_text(audiopaths_and_text), oversample_weights
-            )
+            if os.path.isdir(audiopaths_and_text):
+                self.audiopaths_and_text = Manifest(audiopaths_and_text)
+            else:
+                self.audiopaths_and_text = load_filepaths_and_text(audiopaths_and_text)
         if hasattr(self, "audiopaths_and_text"):
-            self.audiopaths = [i[0] for i in self.audiopaths_and_text]
+            if isinstance(self.audiopaths_and_text, Manifest):
+                self.audiopaths = self.audiopaths_and_text.audiopaths
+            else:
+                self.audiopaths = [i[0] for i in self.audiopaths_and_text]
         else:
             self.audiopaths = audiopaths
 
@@ -110,10 +125,17 @@ class Data(Dataset):
         self.sampling_rate = sampling_rate
         self.filter_length = filter_length
         self.hop_length = hop_length
+        self.win_length = win_length
+        self.n_mel_channels = n_mel_channels
+        self.padding = padding
         self.max_wav_value = max_wav_value
         self.f0_min = f0_min
         self.f0_max = f0_max
         self.use_log_f0 = use_log_f0
+        assert (
+            pitch_backend in PITCH_BACKENDS
+        ), f"pitch_backend must be one of {PITCH_BACKENDS}"
+        self.pitch_backend = pitch_backend
 
         if self.return_mels:
             self.stft = MelSTFT(
@@ -131,14 +153,28 @@ class Data(Dataset):
             self.mel_fmin = mel_fmin
             self.mel_fmax = mel_fmax
 
+            self.load_mels = load_mels
+            self.batch_mels = batch_mels
+            assert not (
+                load_mels and batch_mels
+            ), "load_mels and batch_mels are mutually exclusive"
+            if self.load_mels:
+                self.mel_store = MemmapStore(
+                    os.path.join(mel_cache_path, self.mel_store_name),
+                    n_channels=n_mel_channels,
+                )
+
         if self.return_texts:
             self.text_cleaners = text_cleaners
             self.p_arpabet = p_arpabet
             self.symbol_set = symbol_set
             self.intersperse_text = intersperse_text
             self.intersperse_token = intersperse_token
+            self._text_alternatives = OrderedDict()
             # NOTE (Sam): this could be moved outside of return text if text statistics analogous to text as f0 is to audio are computed.
-            if hasattr(self, "audiopaths_and_text"):
+            if isinstance(getattr(self, "audiopaths_and_text", None), Manifest):
+                self.texts = self.audiopaths_and_text.texts
+            elif hasattr(self, "audiopaths_and_text"):
                 self.texts = [i[1] for i in self.audiopaths_and_text]
             else:
                 self.texts = texts
@@ -147,11 +183,18 @@ class Data(Dataset):
             self.get_gst = get_gst
 
         if self.return_f0s:
-            os.makedirs(self.f0_cache_path, exist_ok=True)
+            self.f0_store = MemmapStore(
+                os.path.join(self.f0_cache_path, self.f0_store_name),
+                n_channels=3,
+                mode="a",
+            )
 
         if self.return_speaker_ids:
             if self.load_speaker_ids:
-                if hasattr(self, "audiopaths_and_text"):
+                if isinstance(getattr(self, "audiopaths_and_text", None), Manifest):
+                    speaker_ids = self.audiopaths_and_text.speaker_names
+                    self._speaker_id_map = _orig_to_dense_speaker_id(speaker_ids)
+                elif hasattr(self, "audiopaths_and_text"):
                     speaker_ids = [i[2] for i in self.audiopaths_and_text]
                     self._speaker_id_map = _orig_to_dense_speaker_id(speaker_ids)
             # else could be speaker classification positions for example.
@@ -163,49 +206,31 @@ class Data(Dataset):
     # NOTE (Sam): this is the RADTTS version - more recent than mellotron from the same author.
     # NOTE (Sam): in contrast to get_gst, the computation here is kept in this file rather than a functional argument.
     def _get_f0(self, audiopath, audio):
-        filename = "_".join(audiopath.split("/")).split(".wav")[0]
-        f0_path = os.path.join(self.f0_cache_path, filename)
-        f0_path += "_f0_sr{}_fl{}_hl{}_f0min{}_f0max{}_log{}.pt".format(
+        if audiopath not in self.f0_store:
+            # NOTE: another worker may have computed it since the last refresh.
+            self.f0_store.refresh()
+        if audiopath in self.f0_store:
+            f0 = torch.tensor(self.f0_store[audiopath][:, 0])
+        else:
+            f0s = self._compute_f0s(audio)
+            self.f0_store.append(audiopath, f0s)
+            f0 = torch.from_numpy(f0s[:, 0].copy())
+
+        f0 = self.f0_normalize(f0)
+
+        return f0
+
+    def _compute_f0s(self, audio):
+        """Return the (n_frames, 3) f0, voiced_mask and p_voiced entry of the f0 store."""
+        f0, voiced_mask, p_voiced = self.get_f0_pvoiced(
+            audio.cpu().numpy(),
             self.sampling_rate,
             self.filter_length,
             self.hop_length,
             self.f0_min,
             self.f0_max,
-            self.use_log_f0,
         )
-
-        # NOTE (Sam): this is inhereted from RAD TTS and redundant with load_f0 syntax.
-        dikt = None
-        if os.path.exists(f0_path):
-            try:
-                dikt = torch.load(f0_path)
-            except:
-                print(f"f0 loading from {f0_path} is broken, recomputing.")
-
-        if dikt is not None:
-            f0 = dikt["f0"]
-            p_voiced = dikt["p_voiced"]
-            voiced_mask = dikt["voiced_mask"]
-        else:
-            f0, voiced_mask, p_voiced = self.get_f0_pvoiced(
-                audio.cpu().numpy(),
-                self.sampling_rate,
-                self.filter_length,
-                self.hop_length,
-                self.f0_min,
-                self.f0_max,
-            )
-            print("saving f0 to {}".format(f0_path))
-            torch.save(
-                {"f0": f0, "voiced_mask": voiced_mask, "p_voiced": p_voiced},
-                f0_path,
-            )
-        if f0 is None:
-            raise Exception("STOP, BROKEN F0 {}".format(audiopath))
-
-        f0 = self.f0_normalize(f0)
-
-        return f0
+        return torch.stack([f0, voiced_mask, p_voiced], dim=1).numpy()
 
     def f0_normalize(self, x):
         if self.use_log_f0:
@@ -215,16 +240,90 @@ class Data(Dataset):
 
         return x
 
+    def _get_text_alternatives(self, text):
+        """Return the text_to_alternatives of a transcript, so cleaning and g2p usually run once per transcript.
+
+        The last TEXT_ALTERNATIVES_CACHE_SIZE transcripts are cached in each worker, so datasets with more
+        transcripts than that recompute some of them every epoch but keep a bounded memory footprint.
+        """
+        alternatives = self._text_alternatives.get(text)
+        if alternatives is None:
+            alternatives = text_to_alternatives(
+                text,
+                self.text_cleaners,
+                symbol_set=self.symbol_set,
+                with_arpabet=self.p_arpabet > 0,
+            )
+            self._text_alternatives[text] = alternatives
+            if len(self._text_alternatives) > TEXT_ALTERNATIVES_CACHE_SIZE:
+                self._text_alternatives.popitem(last=False)
+        else:
+            self._text_alternatives.move_to_end(text)
+        return alternatives
+
     def _get_audio_encoding(self, audio):
         return self.audio_encoder_forward(audio)
 
+    @property
+    def mel_store_name(self):
+        return store_name(
+            "mel",
+            sr=self.sampling_rate,
+            fl=self.filter_length,
+            hl=self.hop_length,
+            wl=self.win_length,
+            nmel=self.n_mel_channels,
+            # NOTE: 8000 and 8000.0 from different configs must name the same store.
+            fmin=None if self.mel_fmin is None else float(self.mel_fmin),
+            fmax=None if self.mel_fmax is None else float(self.mel_fmax),
+            pad=self.padding,
+        )
+
+    @property
+    def f0_store_name(self):
+        return store_name(
+            "f0",
+            sr=self.sampling_rate,
+            fl=self.filter_length,
+            hl=self.hop_length,
+            f0min=self.f0_min,
+            f0max=self.f0_max,
+            pitch=self.pitch_backend,
+        )
+
+    def _load_audio(self, audiopath):
+        # File objects (e.g. archive members) can't be memory-mapped.
+        sampling_rate, wav_data = read(audiopath, mmap=isinstance(audiopath, str))
+        if sampling_rate != self.sampling_rate:
+            raise ValueError(
+                f"{audiopath} has sampling rate {sampling_rate}, not {self.sampling_rate}"
+            )
+        # NOTE (Sam): is this the right normalization?  Should it be done here or in preprocessing.
+        # NOTE: python floats so that -min of int16 does not overflow.
+        peak = max(float(wav_data.max()), -float(wav_data.min())) or 1.0
+        audio_norm = np.multiply(
+            wav_data, 1 / (peak * 2), dtype=np.float32
+        )  # NOTE (Sam): just must be < 1.
+        audio_norm = torch.from_numpy(audio_norm).unsqueeze(0)
+        return audio_norm
+
+    def _get_mel(self, audio_norm):
+        melspec = self.stft.mel_spectrogram(audio_norm)
+        melspec = torch.squeeze(melspec, 0)
+        return melspec
+
     def _get_data(
         self,
         audiopath_and_text: Optional[List[str]] = None,
         audiopath: Optional[str] = None,
         text: Optional[str] = None,
         speaker_id: Optional[int] = None,
+        audio_file=None,
     ):
+        """Return data for a single data point.
+
+        If audio_file (a file object) is given, the audio is read from it and audiopath is only used as the cache key.
+        """
         data = {}
         if audiopath_and_text is not None:
             audiopath, text, speaker_id = audiopath_and_text
@@ -232,13 +331,8 @@ class Data(Dataset):
             speaker_id = self._speaker_id_map[speaker_id]
 
         if self.return_texts:
-            text_sequence = torch.LongTensor(
-                text_to_sequence(
-                    text,
-                    self.text_cleaners,
-                    p_arpabet=self.p_arpabet,
-                    symbol_set=self.symbol_set,
-                )
+            text_sequence = torch.from_numpy(
+                sample_alternatives(self._get_text_alternatives(text), self.p_arpabet)
             )
             if self.intersperse_text:
                 text_sequence = torch.LongTensor(
@@ -246,25 +340,27 @@ class Data(Dataset):
                 )  # add a blank token, whose id number is len(symbols)
             data["text_sequence"] = text_sequence
 
-        if audiopath is not None:
-            sampling_rate, wav_data = read(audiopath)
-            # NOTE (Sam): is this the right normalization?  Should it be done here or in preprocessing.
-            audio = torch.FloatTensor(wav_data)
-            audio_norm = audio / (
-                np.abs(audio).max() * 2
-            )  # NOTE (Sam): just must be < 1.
-            audio_norm = audio_norm.unsqueeze(0)
-
+        audio_norm = None
         if self.return_mels:
-
-            melspec = self.stft.mel_spectrogram(audio_norm)
-            melspec = torch.squeeze(melspec, 0)
-            data["mel"] = melspec
+            if self.load_mels and audiopath in self.mel_store:
+                data["mel"] = torch.from_numpy(self.mel_store[audiopath].T)
+            else:
+                audio_norm = self._load_audio(
+                    audiopath if audio_file is None else audio_file
+                )
+                if self.batch_mels:
+                    data["audio"] = audio_norm[0]
+                else:
+                    data["mel"] = self._get_mel(audio_norm)
 
         f0 = None
         if self.return_f0s:
             if not self.load_f0s:
                 assert audiopath is not None
+                if audio_norm is None:
+                    audio_norm = self._load_audio(
+                        audiopath if audio_file is None else audio_file
+                    )
                 f0 = self._get_f0(audiopath, audio_norm[0])
                 data["f0"] = f0
 
@@ -316,6 +412,46 @@ class Data(Dataset):
             return min(debug_dataset_size, nfiles)
         return nfiles
 
+    def get_mel_lengths(self):
+        """Return the number of mel frames of each data point without computing any mels.
+
+        Lengths come from the mel store if one is loaded, then from the manifest and from the wav headers otherwise.
+        """
+        padding = self.padding or (self.filter_length // 2)
+        manifest = getattr(self, "audiopaths_and_text", None)
+        if not isinstance(manifest, Manifest):
+            manifest = None
+        lengths = np.zeros(len(self), dtype=np.int64)
+        for idx in range(len(self)):
+            audiopath = self.audiopaths[idx]
+            if self.return_mels and self.load_mels and audiopath in self.mel_store:
+                lengths[idx] = self.mel_store.n_frames(audiopath)
+                continue
+            if manifest is not None:
+                n_samples = manifest.n_samples[idx]
+            else:
+                _, n_samples = _wav_header(audiopath)
+            lengths[idx] = (
+                1 + (n_samples + 2 * padding - self.filter_length) // self.hop_length
+            )
+        return lengths
+
+    def get_sample_weights(self):
+        """Return the oversample weight of the speaker of each data point, 1 for speakers without one."""
+        if not hasattr(self, "audiopaths_and_text"):
+            return np.ones(len(self))
+        if isinstance(self.audiopaths_and_text, Manifest):
+            manifest = self.audiopaths_and_text
+            speaker_ids = [
+                manifest.speaker_names[i] for i in manifest.speaker_ids[: len(self)]
+            ]
+        else:
+            speaker_ids = [row[2] for row in self.audiopaths_and_text[: len(self)]]
+        return np.array(
+            [self.oversample_weights.get(sid, 1) for sid in speaker_ids],
+            dtype=np.float64,
+        )
+
     def sample_test_batch(self, size):
         idx = np.random.choice(range(len(self)), size=size, replace=False)
         test_batch = []
@@ -333,6 +469,18 @@ class Data(Dataset):
         f0_max=F0_MAX,
     ):
 
+        if self.pitch_backend == "yin":
+            f0, voiced_mask, p_voiced = batched_yin(
+                audio,
+                sampling_rate,
+                frame_length=frame_length,
+                win_length=frame_length // 2,
+                hop_length=hop_length,
+                f0_min=f0_min,
+                f0_max=f0_max,
+            )
+            return f0, voiced_mask.float(), p_voiced
+
         f0, voiced_mask, p_voiced = pyin(
             audio,
             f0_min,
@@ -1,13 +1,14 @@
 # TODO (Sam): use standard data loader
+import json
 import math
 import os
 import random
 import torch
 import torch.utils.data
 import numpy as np
-from librosa.util import normalize
 from scipy.io.wavfile import read
-from librosa.filters import mel as librosa_mel_fn
+from ..models.spectral import mel_filterbank, stft_window
+from .store import MemmapStore, META_FILENAME
 
 MAX_WAV_VALUE = 32768.0
 
@@ -17,6 +18,17 @@ def load_wav(full_path):
     return data, sampling_rate
 
 
+def wav_peak(data):
+    """Largest absolute sample value of raw wav data, as a python float so that -min of int16 does not overflow."""
+    return max(float(data.max()), -float(data.min())) if len(data) else 0.0
+
+
+def load_peak_table(path):
+    """Load the {filename: peak} table written by exec/precompute_peaks.py."""
+    with open(path) as f:
+        return json.load(f)
+
+
 def dynamic_range_compression(x, C=1, clip_val=1e-5):
     return np.log(np.clip(x, a_min=clip_val, a_max=None) * C)
 
@@ -43,31 +55,26 @@ def spectral_de_normalize_torch(magnitudes):
     return output
 
 
-mel_basis = {}
-hann_window = {}
-
-
 def mel_spectrogram(y, n_fft, num_mels, sampling_rate, hop_size, win_size, fmin, fmax, center=False):
     if torch.min(y) < -1.:
         print('min value is ', torch.min(y))
     if torch.max(y) > 1.:
         print('max value is ', torch.max(y))
 
-    global mel_basis, hann_window
-    if fmax not in mel_basis:
-        mel = librosa_mel_fn(sampling_rate, n_fft, num_mels, fmin, fmax)
-        mel_basis[str(fmax)+'_'+str(y.device)] = torch.from_numpy(mel).float().to(y.device)
-        hann_window[str(y.device)] = torch.hann_window(win_size).to(y.device)
+    mel_basis = mel_filterbank(sampling_rate, n_fft, num_mels, fmin, fmax, device=y.device, dtype=y.dtype)
+    hann_window = stft_window("hann", win_size, device=y.device, dtype=y.dtype)
 
     y = torch.nn.functional.pad(y.unsqueeze(1), (int((n_fft-hop_size)/2), int((n_fft-hop_size)/2)), mode='reflect')
     y = y.squeeze(1)
 
-    spec = torch.stft(y, n_fft, hop_length=hop_size, win_length=win_size, window=hann_window[str(y.device)],
-                      center=center, pad_mode='reflect', normalized=False, onesided=True)
+    # NOTE: newer torch requires return_complex, view_as_real keeps the (..., 2) layout of older versions.
+    spec = torch.view_as_real(torch.stft(y, n_fft, hop_length=hop_size, win_length=win_size, window=hann_window,
+                                         center=center, pad_mode='reflect', normalized=False, onesided=True,
+                                         return_complex=True))
 
     spec = torch.sqrt(spec.pow(2).sum(-1)+(1e-9))
 
-    spec = torch.matmul(mel_basis[str(fmax)+'_'+str(y.device)], spec)
+    spec = torch.matmul(mel_basis, spec)
     spec = spectral_normalize_torch(spec)
 
     return spec
@@ -87,7 +94,8 @@ def get_dataset_filelist(a):
 class MelDataset(torch.utils.data.Dataset):
     def __init__(self, training_files, segment_size, n_fft, num_mels,
                  hop_size, win_size, sampling_rate,  fmin, fmax, split=True, shuffle=True, n_cache_reuse=1,
-                 device=None, fmax_loss=None, fine_tuning=False, base_mels_path=None):
+                 device=None, fmax_loss=None, fine_tuning=False, base_mels_path=None, peak_table=None,
+                 audio_cache=None):
         self.audio_files = training_files
         random.seed(1234)
         if shuffle:
@@ -108,56 +116,109 @@ class MelDataset(torch.utils.data.Dataset):
         self.device = device
         self.fine_tuning = fine_tuning
         self.base_mels_path = base_mels_path
+        self.mel_store = None
+        if base_mels_path and os.path.exists(os.path.join(base_mels_path, META_FILENAME)):
+            self.mel_store = MemmapStore(base_mels_path)
+        # NOTE: peaks missing from the table are computed by _load_audio and kept for later epochs;
+        # exec/precompute_peaks.py builds the table.
+        if isinstance(peak_table, str):
+            peak_table = load_peak_table(peak_table)
+        self.peaks = dict(peak_table or {})
+        self.audio_cache = audio_cache
+
+    def _load_audio(self, filename):
+        """Return the memory-mapped samples of a file and the scale that normalizes them.
+
+        Nothing but the header is read here, so only the samples of the segment that is used are ever read from disk,
+        except when the peak of the file is not in the peak table: then the whole file is read once (per worker) to find it.
+        With an audio cache, whole files are normalized once and served from the cache with a scale of 1.
+        """
+        if self.audio_cache is not None:
+            audio = self.audio_cache.get(filename)
+            if audio is not None:
+                return audio.numpy(), 1.0
+        sampling_rate, data = read(filename, mmap=True)
+        if sampling_rate != self.sampling_rate:
+            raise ValueError("{} SR doesn't match target {} SR".format(
+                sampling_rate, self.sampling_rate))
+        if self.fine_tuning:
+            scale = 1 / MAX_WAV_VALUE
+        else:
+            peak = self.peaks.get(filename)
+            if peak is None:
+                peak = wav_peak(data)
+                self.peaks[filename] = peak
+            scale = 0.95 / peak if peak > 0 else 1 / MAX_WAV_VALUE
+        if self.audio_cache is not None:
+            audio = self._read_segment(data, scale, 0, len(data))[0]
+            self.audio_cache.put(filename, audio)
+            return audio.numpy(), 1.0
+        return data, scale
+
+    def _load_mel(self, filename):
+        """Return a memory-mapped (1, num_mels, n_frames) view of the ground truth aligned mel of a file.
+
+        Mels come from a MemmapStore (see exec/pack_mels.py) if base_mels_path is one, and from one .npy per file otherwise.
+        Only the frames that are sliced from the view and copied are read from disk.
+        """
+        key = os.path.splitext(filename)[0]
+        if self.mel_store is not None:
+            return self.mel_store[key].T[None]
+        mel = np.load(os.path.join(self.base_mels_path, key + '.npy'), mmap_mode='r')
+        if len(mel.shape) < 3:
+            mel = mel[None]
+        return mel
+
+    def _read_segment(self, data, scale, start, stop):
+        segment = np.multiply(data[start:stop], scale, dtype=np.float32)
+        return torch.from_numpy(segment).unsqueeze(0)
 
     def __getitem__(self, index):
         filename = self.audio_files[index]
         if self._cache_ref_count == 0:
-            audio, sampling_rate = load_wav(filename)
-            audio = audio / MAX_WAV_VALUE
-            if not self.fine_tuning:
-                audio = normalize(audio) * 0.95
-            self.cached_wav = audio
-            if sampling_rate != self.sampling_rate:
-                raise ValueError("{} SR doesn't match target {} SR".format(
-                    sampling_rate, self.sampling_rate))
+            data, scale = self._load_audio(filename)
+            self.cached_wav = (data, scale)
             self._cache_ref_count = self.n_cache_reuse
         else:
-            audio = self.cached_wav
+            data, scale = self.cached_wav
             self._cache_ref_count -= 1
-
-        audio = torch.FloatTensor(audio)
-        audio = audio.unsqueeze(0)
+        n_samples = len(data)
 
         if not self.fine_tuning:
             if self.split:
-                if audio.size(1) >= self.segment_size:
-                    max_audio_start = audio.size(1) - self.segment_size
+                if n_samples >= self.segment_size:
+                    max_audio_start = n_samples - self.segment_size
                     audio_start = random.randint(0, max_audio_start)
-                    audio = audio[:, audio_start:audio_start+self.segment_size]
+                    audio = self._read_segment(data, scale, audio_start, audio_start+self.segment_size)
                 else:
+                    audio = self._read_segment(data, scale, 0, n_samples)
                     audio = torch.nn.functional.pad(audio, (0, self.segment_size - audio.size(1)), 'constant')
+            else:
+                audio = self._read_segment(data, scale, 0, n_samples)
 
             mel = mel_spectrogram(audio, self.n_fft, self.num_mels,
                                   self.sampling_rate, self.hop_size, self.win_size, self.fmin, self.fmax,
                                   center=False)
         else:
-            mel = np.load(
-                os.path.join(self.base_mels_path, os.path.splitext(filename)[0] + '.npy'))
-            mel = torch.from_numpy(mel)
-
-            if len(mel.shape) < 3:
-                mel = mel.unsqueeze(0)
+            mel = self._load_mel(filename)
 
             if self.split:
                 frames_per_seg = math.ceil(self.segment_size / self.hop_size)
 
-                if audio.size(1) >= self.segment_size:
-                    mel_start = random.randint(0, mel.size(2) - frames_per_seg - 1)
+                if n_samples >= self.segment_size:
+                    mel_start = random.randint(0, mel.shape[2] - frames_per_seg - 1)
                     mel = mel[:, :, mel_start:mel_start + frames_per_seg]
-                    audio = audio[:, mel_start * self.hop_size:(mel_start + frames_per_seg) * self.hop_size]
+                    audio = self._read_segment(data, scale, mel_start * self.hop_size,
+                                               (mel_start + frames_per_seg) * self.hop_size)
+                    mel = torch.from_numpy(np.array(mel))
                 else:
+                    mel = torch.from_numpy(np.array(mel))
                     mel = torch.nn.functional.pad(mel, (0, frames_per_seg - mel.size(2)), 'constant')
+                    audio = self._read_segment(data, scale, 0, n_samples)
                     audio = torch.nn.functional.pad(audio, (0, self.segment_size - audio.size(1)), 'constant')
+            else:
+                mel = torch.from_numpy(np.array(mel))
+                audio = self._read_segment(data, scale, 0, n_samples)
 
         mel_loss = mel_spectrogram(audio, self.n_fft, self.num_mels,
                                    self.sampling_rate, self.hop_size, self.win_size, self.fmin, self.fmax_loss,
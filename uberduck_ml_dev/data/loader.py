@@ -0,0 +1,54 @@
+__all__ = ["DevicePrefetcher"]
+
+import torch
+
+
+class DevicePrefetcher:
+    """Wrap a loader of Batch objects and move each batch to device.
+
+    On cuda, the next batch is copied on a side stream with non_blocking copies while the current
+    batch is being used, so with a pinned (pin_memory=True) loader the transfer overlaps with compute.
+    transform, if given, is applied to each batch on device (e.g. data.batched_mel.BatchedMel).
+    """
+
+    def __init__(self, loader, device="cpu", transform=None):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.transform = transform
+        self.stream = torch.cuda.Stream() if self.device.type == "cuda" else None
+
+    def __len__(self):
+        return len(self.loader)
+
+    def _to_device(self, batch):
+        with torch.cuda.stream(self.stream):
+            return batch.to_device(self.device, non_blocking=True)
+
+    def __iter__(self):
+        if self.transform is None:
+            return self._iter()
+        return (self.transform(batch) for batch in self._iter())
+
+    def _iter(self):
+        if self.stream is None:
+            for batch in self.loader:
+                yield batch.to_device(self.device)
+            return
+
+        iterator = iter(self.loader)
+        next_batch = next(iterator, None)
+        if next_batch is not None:
+            next_batch = self._to_device(next_batch)
+        while next_batch is not None:
+            current_stream = torch.cuda.current_stream()
+            current_stream.wait_stream(self.stream)
+            # NOTE: the copy was issued a step ago, so this rarely blocks, and it lets Collate reuse its host buffers.
+            self.stream.synchronize()
+            batch = next_batch
+            for v in batch.values():
+                if isinstance(v, torch.Tensor):
+                    v.record_stream(current_stream)
+            next_batch = next(iterator, None)
+            if next_batch is not None:
+                next_batch = self._to_device(next_batch)
+            yield batch
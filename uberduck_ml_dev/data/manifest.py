@@ -0,0 +1,162 @@
+__all__ = ["Manifest", "StringColumn", "write_manifest"]
+
+import json
+import os
+from typing import List
+
+import numpy as np
+
+from .utils import _orig_to_dense_speaker_id, _wav_header
+from ..utils.utils import load_filepaths_and_text
+
+META_FILENAME = "meta.json"
+STRING_COLUMNS = ["audiopaths", "texts"]
+ARRAY_COLUMNS = ["speaker_ids", "n_samples", "sampling_rates", "text_lengths"]
+
+
+class StringColumn:
+    """Read-only sequence of strings stored as utf-8 bytes and an offset array."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        return bytes(self.data[self.offsets[idx] : self.offsets[idx + 1]]).decode(
+            "utf-8"
+        )
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+# NOTE: a manifest holds no per-row python objects, so DataLoader workers share its pages instead of copying them on refcount writes.
+class Manifest:
+    """Memory-mapped columnar version of a "audiopath|text|speaker_id" filelist, built by write_manifest.
+
+    Rows are returned as [audiopath, text, speaker_id] lists like the rows of load_filepaths_and_text.
+    speaker_ids are the dense ids of _orig_to_dense_speaker_id and speaker_names the original ids.
+    Opening a manifest only reads meta.json; the columns are mapped on first use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILENAME)) as f:
+            meta = json.load(f)
+        self.n_rows = meta["n_rows"]
+        self.speaker_names = meta["speaker_names"]
+        self._columns = None
+
+    def _load(self):
+        columns = {}
+        for name in STRING_COLUMNS:
+            data_path = os.path.join(self.path, f"{name}.bin")
+            data = (
+                np.memmap(data_path, mode="r")
+                if os.path.getsize(data_path)
+                else np.zeros(0, dtype=np.uint8)
+            )
+            offsets = np.load(
+                os.path.join(self.path, f"{name}_offsets.npy"), mmap_mode="r"
+            )
+            columns[name] = StringColumn(data, offsets)
+        for name in ARRAY_COLUMNS:
+            columns[name] = np.load(
+                os.path.join(self.path, f"{name}.npy"), mmap_mode="r"
+            )
+        self._columns = columns
+
+    def _column(self, name):
+        if self._columns is None:
+            self._load()
+        return self._columns[name]
+
+    @property
+    def audiopaths(self):
+        return self._column("audiopaths")
+
+    @property
+    def texts(self):
+        return self._column("texts")
+
+    @property
+    def speaker_ids(self):
+        return self._column("speaker_ids")
+
+    @property
+    def n_samples(self):
+        return self._column("n_samples")
+
+    @property
+    def sampling_rates(self):
+        return self._column("sampling_rates")
+
+    @property
+    def text_lengths(self):
+        return self._column("text_lengths")
+
+    @property
+    def durations(self):
+        return self.n_samples / self.sampling_rates
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, idx):
+        return [
+            self.audiopaths[idx],
+            self.texts[idx],
+            self.speaker_names[self.speaker_ids[idx]],
+        ]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getstate__(self):
+        # NOTE: pickling a memmap copies its contents, so workers remap instead.
+        state = self.__dict__.copy()
+        state["_columns"] = None
+        return state
+
+
+def _write_strings(path, name, strings: List[str]):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    with open(os.path.join(path, f"{name}.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(path, f"{name}_offsets.npy"), offsets)
+
+
+def write_manifest(filelist: str, path: str, split: str = "|"):
+    """Build the manifest of a filelist. Durations are read from the wav headers."""
+    rows = load_filepaths_and_text(filelist, split=split)
+    os.makedirs(path, exist_ok=True)
+
+    _write_strings(path, "audiopaths", [row[0] for row in rows])
+    _write_strings(path, "texts", [row[1] for row in rows])
+    speaker_id_map = _orig_to_dense_speaker_id([row[2] for row in rows])
+    speaker_names = sorted(speaker_id_map, key=speaker_id_map.get)
+    np.save(
+        os.path.join(path, "speaker_ids.npy"),
+        np.array([speaker_id_map[row[2]] for row in rows], dtype=np.int64),
+    )
+    n_samples = np.zeros(len(rows), dtype=np.int64)
+    sampling_rates = np.zeros(len(rows), dtype=np.int32)
+    for idx, row in enumerate(rows):
+        sampling_rates[idx], n_samples[idx] = _wav_header(row[0])
+    np.save(os.path.join(path, "n_samples.npy"), n_samples)
+    np.save(os.path.join(path, "sampling_rates.npy"), sampling_rates)
+    np.save(
+        os.path.join(path, "text_lengths.npy"),
+        np.array([len(row[1]) for row in rows], dtype=np.int32),
+    )
+    # NOTE: meta.json is written last, so a manifest with one is complete.
+    with open(os.path.join(path, META_FILENAME), "w") as f:
+        json.dump(dict(n_rows=len(rows), speaker_names=speaker_names), f)
+    return Manifest(path)
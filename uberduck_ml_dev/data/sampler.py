@@ -0,0 +1,223 @@
+__all__ = [
+    "weighted_indices",
+    "WeightedSampler",
+    "BucketBatchSampler",
+    "FrameBudgetBatchSampler",
+]
+
+from typing import List, Optional
+
+import numpy as np
+from torch.utils.data import Sampler
+
+
+def weighted_indices(weights, num_samples: int, rng):
+    """Draw num_samples indices, index i appearing num_samples * weights[i] / sum(weights) times in expectation.
+
+    Each index appears the integer part of its expected count times and the remaining samples go to distinct
+    indices drawn in proportion to the fractional parts, so integer weights with num_samples = sum(weights)
+    reproduce list duplication (data.utils.oversample) exactly.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    expected = num_samples * weights / weights.sum()
+    counts = np.floor(expected).astype(np.int64)
+    remainder = num_samples - counts.sum()
+    if remainder > 0:
+        fractions = expected - counts
+        extra = rng.choice(
+            len(weights), size=remainder, replace=False, p=fractions / fractions.sum()
+        )
+        counts[extra] += 1
+    return np.repeat(np.arange(len(weights)), counts)
+
+
+class _EpochSampler(Sampler):
+    """Base of the samplers below, which draw the data points of an epoch from seed + epoch.
+
+    With weights, an epoch is num_samples data points drawn by weighted_indices, sum(weights) by default.
+    num_samples without weights draws uniformly, and neither gives every data point once.
+    Call set_epoch at the start of every epoch for a new order, as with DistributedSampler.
+    """
+
+    def __init__(
+        self,
+        n: int,
+        weights: Optional[List[float]] = None,
+        num_samples: Optional[int] = None,
+        seed: int = 0,
+    ):
+        self.n = n
+        if weights is None and num_samples is not None:
+            weights = np.ones(n)
+        self.weights = weights
+        if weights is not None and num_samples is None:
+            num_samples = int(round(sum(weights)))
+        self.num_samples = n if num_samples is None else num_samples
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def _indices(self, rng):
+        """The data points of this epoch, each once without weights or num_samples."""
+        if self.weights is None:
+            return np.arange(self.n)
+        return weighted_indices(self.weights, self.num_samples, rng)
+
+
+class WeightedSampler(_EpochSampler):
+    """Sampler over the unique data points that draws each in proportion to its (possibly fractional) weight.
+
+    An epoch is num_samples data points, sum(weights) by default.
+    """
+
+    def __init__(
+        self,
+        weights: List[float],
+        num_samples: Optional[int] = None,
+        shuffle: bool = True,
+        seed: int = 0,
+    ):
+        super().__init__(len(weights), weights, num_samples, seed)
+        self.shuffle = shuffle
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        indices = self._indices(rng)
+        if self.shuffle:
+            rng.shuffle(indices)
+        return iter(indices.tolist())
+
+    def __len__(self):
+        return self.num_samples
+
+
+class BucketBatchSampler(_EpochSampler):
+    """Batch sampler that groups utterances of similar length.
+
+    Indices are sorted by length and cut into buckets of n_batches_per_bucket batches.
+    Each epoch, items are shuffled within their bucket and split into batches, and the batches
+    of all buckets are shuffled together, so padding (and decoder steps) stay close to each item's own length.
+    With weights or num_samples, the items of an epoch are drawn as by WeightedSampler.
+    """
+
+    def __init__(
+        self,
+        lengths: List[int],
+        batch_size: int,
+        n_batches_per_bucket: int = 50,
+        shuffle: bool = True,
+        drop_last: bool = False,
+        seed: int = 0,
+        weights: Optional[List[float]] = None,
+        num_samples: Optional[int] = None,
+    ):
+        super().__init__(len(lengths), weights, num_samples, seed)
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.n_batches_per_bucket = n_batches_per_bucket
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+
+    def _batches(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        indices = self._indices(rng)
+        lengths = self.lengths[indices]
+        if self.shuffle:
+            # NOTE: random tie-breaking so that equal lengths don't always land in the same bucket.
+            order = indices[np.lexsort((rng.random(len(lengths)), lengths))]
+        else:
+            order = indices[np.argsort(lengths, kind="stable")]
+
+        batches = []
+        bucket_size = self.batch_size * self.n_batches_per_bucket
+        for start in range(0, len(order), bucket_size):
+            bucket = order[start : start + bucket_size]
+            if self.shuffle:
+                bucket = rng.permutation(bucket)
+            for i in range(0, len(bucket), self.batch_size):
+                batch = bucket[i : i + self.batch_size]
+                if self.drop_last and len(batch) < self.batch_size:
+                    continue
+                batches.append(batch.tolist())
+
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        return batches
+
+    def __iter__(self):
+        return iter(self._batches())
+
+    def __len__(self):
+        n_buckets, remainder = divmod(
+            self.num_samples, self.batch_size * self.n_batches_per_bucket
+        )
+        n_batches = n_buckets * self.n_batches_per_bucket
+        if self.drop_last:
+            return n_batches + remainder // self.batch_size
+        return n_batches + -(-remainder // self.batch_size)
+
+
+class FrameBudgetBatchSampler(_EpochSampler):
+    """Batch sampler that packs utterances into batches of at most max_frames padded frames.
+
+    The cost of a batch is its size times its longest item, i.e. the size of the padded mel batch,
+    so short utterances are packed into large batches and long ones into small batches.
+    Indices are shuffled and then stably sorted by length before packing, so ties are broken differently
+    every epoch, and the batch order is shuffled. Items longer than max_frames get a batch of their own.
+    With weights or num_samples, the items of an epoch are drawn as by WeightedSampler.
+    """
+
+    def __init__(
+        self,
+        lengths: List[int],
+        max_frames: int,
+        max_batch_size: Optional[int] = None,
+        shuffle: bool = True,
+        seed: int = 0,
+        weights: Optional[List[float]] = None,
+        num_samples: Optional[int] = None,
+    ):
+        super().__init__(len(lengths), weights, num_samples, seed)
+        self.lengths = np.asarray(lengths)
+        self.max_frames = max_frames
+        self.max_batch_size = max_batch_size
+        self.shuffle = shuffle
+        self.set_epoch(self.epoch)
+
+    def set_epoch(self, epoch: int):
+        super().set_epoch(epoch)
+        # NOTE: packed once per epoch, since __len__ is called every training step and the count varies with weights.
+        self.batches = self._batches()
+
+    def _batches(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        indices = self._indices(rng)
+        if self.shuffle:
+            indices = rng.permutation(indices)
+        order = indices[np.argsort(self.lengths[indices], kind="stable")]
+
+        batches = []
+        batch = []
+        for idx in order.tolist():
+            n_frames = (len(batch) + 1) * self.lengths[idx]
+            if batch and (
+                n_frames > self.max_frames
+                or (self.max_batch_size and len(batch) == self.max_batch_size)
+            ):
+                batches.append(batch)
+                batch = []
+            batch.append(idx)
+        if batch:
+            batches.append(batch)
+
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        return batches
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
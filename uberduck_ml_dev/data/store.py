@@ -0,0 +1,177 @@
+__all__ = ["MemmapStore", "store_name"]
+
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+META_FILENAME = "meta.json"
+SHARD_SUFFIX = ".bin"
+INDEX_SUFFIX = ".idx"
+MAX_SHARD_BYTES = 2**30
+
+
+def store_name(prefix: str, **params):
+    """Directory name of a store for a given set of feature parameters.
+
+    Matches the naming of the per-utterance f0 cache files, e.g.
+    store_name("mel", sr=22050, hl=256) -> "mel_sr22050_hl256".
+    """
+    return "_".join([prefix] + [f"{k}{v}" for k, v in params.items()])
+
+
+# NOTE: arrays are stored time-major so that a slice of frames touches a single contiguous region of the shard.
+class MemmapStore:
+    """Variable-length (n_frames, n_channels) arrays in contiguous memory-mapped shards.
+
+    A store is a directory holding meta.json, raw binary shards and one append-only index per shard.
+    Each index line is "key<TAB>offset<TAB>n_frames" and is only written after the frames it points to,
+    so a reader never sees a partially written entry. Each writer creates its own shards, so several processes
+    can append to the same store at once; call refresh to see their entries. Writers such as exec/precompute_mels.py
+    skip keys already in the store, so an interrupted run can be resumed.
+    Entries are returned as zero-copy views of the shards.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        n_channels: Optional[int] = None,
+        dtype: str = "float32",
+        mode: str = "r",
+        shard_prefix: str = "shard",
+        max_shard_bytes: int = MAX_SHARD_BYTES,
+    ):
+        assert mode in ["r", "a"], "mode must be 'r' or 'a'"
+        self.path = path
+        self.mode = mode
+        self.shard_prefix = shard_prefix
+        self.max_shard_bytes = max_shard_bytes
+
+        meta_path = os.path.join(path, META_FILENAME)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if n_channels is not None and n_channels != meta["n_channels"]:
+                raise ValueError(
+                    f"Store {path} has {meta['n_channels']} channels, not {n_channels}"
+                )
+        elif mode == "a":
+            assert n_channels is not None, "n_channels is required to create a store"
+            os.makedirs(path, exist_ok=True)
+            meta = dict(n_channels=n_channels, dtype=np.dtype(dtype).name)
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        else:
+            raise FileNotFoundError(f"No store found at {path}")
+
+        self.n_channels = meta["n_channels"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.frame_bytes = self.n_channels * self.dtype.itemsize
+
+        self._index = {}
+        self._index_sizes = {}
+        self._shards = {}
+        self._writer = None
+        self.refresh()
+
+    def refresh(self):
+        """Read index lines appended since the last refresh."""
+        for filename in sorted(os.listdir(self.path)):
+            if not filename.endswith(INDEX_SUFFIX):
+                continue
+            shard = filename[: -len(INDEX_SUFFIX)]
+            start = self._index_sizes.get(shard, 0)
+            with open(os.path.join(self.path, filename), "rb") as f:
+                f.seek(start)
+                lines = f.read().split(b"\n")
+            # NOTE: the last element is either empty or a line still being written.
+            for line in lines[:-1]:
+                key, offset, n_frames = line.decode("utf-8").split("\t")
+                self._index[key] = (shard, int(offset), int(n_frames))
+                start += len(line) + 1
+            self._index_sizes[shard] = start
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def n_frames(self, key):
+        return self._index[key][2]
+
+    def _shard(self, shard, end):
+        mm = self._shards.get(shard)
+        if mm is None or len(mm) < end:
+            # NOTE: "c" (copy-on-write) gives writable views for torch.from_numpy without ever touching the file.
+            shard_path = os.path.join(self.path, shard + SHARD_SUFFIX)
+            mm = np.memmap(
+                shard_path,
+                dtype=self.dtype,
+                mode="c",
+                shape=(
+                    os.path.getsize(shard_path) // self.frame_bytes,
+                    self.n_channels,
+                ),
+            )
+            self._shards[shard] = mm
+        return mm
+
+    def get(self, key, start: int = 0, stop: Optional[int] = None):
+        """Return frames [start, stop) of an entry as a (n_frames, n_channels) view."""
+        shard, offset, n_frames = self._index[key]
+        stop = n_frames if stop is None else min(stop, n_frames)
+        return self._shard(shard, offset + n_frames)[offset + start : offset + stop]
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def _open_writer(self):
+        n = 0
+        while True:
+            shard = f"{self.shard_prefix}-{n:05d}"
+            try:
+                data = open(os.path.join(self.path, shard + SHARD_SUFFIX), "xb")
+                break
+            except FileExistsError:
+                n += 1
+        index = open(os.path.join(self.path, shard + INDEX_SUFFIX), "ab")
+        self._writer = (os.getpid(), shard, data, index)
+
+    def append(self, key: str, array: np.ndarray):
+        """Append a (n_frames, n_channels) array under key."""
+        assert self.mode == "a", "store was opened read-only"
+        assert (
+            "\t" not in key and "\n" not in key
+        ), "key must not contain tabs or newlines"
+        array = np.ascontiguousarray(array, dtype=self.dtype)
+        assert array.ndim == 2 and array.shape[1] == self.n_channels
+        # NOTE: a writer inherited through fork belongs to the parent process.
+        if self._writer is None or self._writer[0] != os.getpid():
+            self._open_writer()
+        _, shard, data, index = self._writer
+        offset = data.tell() // self.frame_bytes
+        data.write(array.tobytes())
+        data.flush()
+        index.write(f"{key}\t{offset}\t{array.shape[0]}\n".encode("utf-8"))
+        index.flush()
+        self._index[key] = (shard, offset, array.shape[0])
+        if data.tell() >= self.max_shard_bytes:
+            self.close()
+
+    def close(self):
+        if self._writer is not None:
+            _, _, data, index = self._writer
+            data.close()
+            index.close()
+            self._writer = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        state["_writer"] = None
+        return state
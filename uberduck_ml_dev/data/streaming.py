@@ -0,0 +1,147 @@
+__all__ = ["StreamingData", "read_archive_filelist"]
+
+import io
+import os
+import random
+import tarfile
+from typing import List, Optional
+from zipfile import ZipFile
+
+import torch
+from torch.utils.data import IterableDataset
+
+from .data import Data
+from .utils import _orig_to_dense_speaker_id
+
+
+def _is_tar(archive):
+    return not archive.endswith(".zip")
+
+
+def _filelist_rows(content: bytes, split="|"):
+    return [
+        line.strip().split(split)
+        for line in content.decode("utf-8").splitlines()
+        if line.strip()
+    ]
+
+
+def read_archive_filelist(archive: str):
+    """Return the rows of the filelist stored in an archive written by exec/gather_dataset.py.
+
+    The filelist is the first member that is not a wav file.
+    """
+    if _is_tar(archive):
+        with tarfile.open(archive, "r|*") as tf:
+            for member in tf:
+                if member.isfile() and not member.name.endswith(".wav"):
+                    return _filelist_rows(tf.extractfile(member).read())
+    else:
+        with ZipFile(archive) as zf:
+            for name in zf.namelist():
+                if not name.endswith(".wav"):
+                    return _filelist_rows(zf.read(name))
+    raise ValueError(f"No filelist found in {archive}")
+
+
+def _iter_archive(archive: str, rows, keep):
+    """Yield (audiopath, text, speaker_id, wav bytes) for the rows of an archive for which keep(index) is True."""
+    if _is_tar(archive):
+        row_index = {row[0]: (idx, row) for idx, row in enumerate(rows)}
+        with tarfile.open(archive, "r|*") as tf:
+            for member in tf:
+                if member.name not in row_index:
+                    continue
+                idx, (relpath, text, speaker_id) = row_index[member.name]
+                if keep(idx):
+                    wav = tf.extractfile(member).read()
+                    yield os.path.join(archive, relpath), text, speaker_id, wav
+    else:
+        with ZipFile(archive) as zf:
+            for idx, (relpath, text, speaker_id) in enumerate(rows):
+                if keep(idx):
+                    wav = zf.read(relpath)
+                    yield os.path.join(archive, relpath), text, speaker_id, wav
+
+
+class StreamingData(IterableDataset):
+    """Iterable version of Data that streams samples straight out of zip or tar archives of exec/gather_dataset.py.
+
+    Archives are split between DataLoader workers (and ranks), or their rows are if there are fewer archives than workers.
+    Samples are shuffled with a buffer of shuffle_buffer_size raw samples. The order changes every epoch,
+    including with persistent workers. Cache keys (e.g. of the f0 store) are "<archive>/<audiopath>".
+    Remaining keyword arguments are those of Data.
+    """
+
+    def __init__(
+        self,
+        archives: List[str],
+        shuffle_buffer_size: int = 1000,
+        seed: int = 0,
+        rank: int = 0,
+        world_size: int = 1,
+        **data_kwargs,
+    ):
+        super().__init__()
+        self.archives = archives
+        self.shuffle_buffer_size = shuffle_buffer_size
+        self.seed = seed
+        self.rank = rank
+        self.world_size = world_size
+        self.epoch = 0
+        self._n_iters = 0
+
+        self.rows = [read_archive_filelist(archive) for archive in archives]
+        self.data = Data(**data_kwargs)
+        if self.data.return_speaker_ids:
+            self.data._speaker_id_map = _orig_to_dense_speaker_id(
+                [row[2] for rows in self.rows for row in rows]
+            )
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __len__(self):
+        return sum(len(rows) for rows in self.rows)
+
+    def _samples(self, rng):
+        worker_info = torch.utils.data.get_worker_info()
+        num_workers = 1 if worker_info is None else worker_info.num_workers
+        worker_id = 0 if worker_info is None else worker_info.id
+        n_shards = self.world_size * num_workers
+        shard = self.rank * num_workers + worker_id
+
+        order = list(range(len(self.archives)))
+        rng.shuffle(order)
+        if len(self.archives) >= n_shards:
+            order = order[shard::n_shards]
+            keep = lambda idx: True
+        else:
+            keep = lambda idx: idx % n_shards == shard
+        for archive_idx in order:
+            yield from _iter_archive(
+                self.archives[archive_idx], self.rows[archive_idx], keep
+            )
+
+    def __iter__(self):
+        # NOTE: with persistent workers, set_epoch only reaches the main process copy, so also count iterations.
+        rng = random.Random(self.seed + self.epoch + self._n_iters)
+        self._n_iters += 1
+
+        buffer = []
+        for sample in self._samples(rng):
+            if len(buffer) < self.shuffle_buffer_size:
+                buffer.append(sample)
+                continue
+            idx = rng.randrange(len(buffer))
+            buffer[idx], sample = sample, buffer[idx]
+            yield self._get_data(sample)
+        rng.shuffle(buffer)
+        for sample in buffer:
+            yield self._get_data(sample)
+
+    def _get_data(self, sample):
+        audiopath, text, speaker_id, wav = sample
+        return self.data._get_data(
+            [audiopath, text, speaker_id], audio_file=io.BytesIO(wav)
+        )
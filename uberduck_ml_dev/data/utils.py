@@ -1,4 +1,5 @@
 import numpy as np
+from scipy.io.wavfile import read
 
 
 def oversample(filepaths_text_sid, sid_to_weight):
@@ -18,3 +19,12 @@ def _orig_to_dense_speaker_id(speaker_ids):
         orig: idx for orig, idx in zip(speaker_ids[id_order], range(len(speaker_ids)))
     }
     return output
+
+
+def _wav_header(path):
+    """Return the sampling rate and number of samples of a wav file.
+
+    The file is memory-mapped, so only its header is read.
+    """
+    sampling_rate, data = read(path, mmap=True)
+    return sampling_rate, len(data)
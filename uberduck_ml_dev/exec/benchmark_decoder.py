@@ -0,0 +1,96 @@
+__all__ = ["run", "parse_args"]
+
+
+import argparse
+import json
+import sys
+import time
+
+import torch
+
+from ..models.components.decoders.tacotron2 import Decoder
+from ..models.tacotron2 import DEFAULTS as TACOTRON2_DEFAULTS
+from ..vendor.tfcompat.hparam import HParams
+
+
+def _time(fn, n_iters):
+    fn()
+    start = time.perf_counter()
+    for _ in range(n_iters):
+        fn()
+    return (time.perf_counter() - start) / n_iters
+
+
+def run(
+    n_steps=[250, 500, 1000, 2000],
+    batch_size=1,
+    n_encoder_steps=100,
+    n_iters=3,
+    device="cpu",
+    num_threads=None,
+):
+    """Time the Tacotron2 decoder's teacher-forced forward and its inference on long utterances.
+
+    Inference never stops on the gate, so it always runs max_decoder_steps = n steps. Constant ms_per_step
+    across n means the cost of the output buffers grows linearly with the utterance length.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    results = []
+    for n in n_steps:
+        config = TACOTRON2_DEFAULTS.values()
+        config.update(
+            max_decoder_steps=n,
+            gate_threshold=1.1,
+            cudnn_enabled=device == "cuda",
+        )
+        hparams = HParams(**config)
+        decoder = Decoder(hparams).to(device).eval()
+        memory = torch.randn(
+            batch_size, n_encoder_steps, hparams.encoder_embedding_dim, device=device
+        )
+        memory_lengths = torch.full(
+            (batch_size,), n_encoder_steps, dtype=torch.long, device=device
+        )
+        mels = torch.randn(batch_size, hparams.n_mel_channels, n + 1, device=device)
+        with torch.no_grad():
+            forward_seconds = _time(
+                lambda: decoder(memory, mels, memory_lengths), n_iters
+            )
+            inference_seconds = _time(
+                lambda: decoder.inference(memory, memory_lengths), n_iters
+            )
+        results.append(
+            {
+                "n_steps": n,
+                "batch_size": batch_size,
+                "forward_seconds": forward_seconds,
+                "forward_ms_per_step": 1000 * forward_seconds / n,
+                "inference_seconds": inference_seconds,
+                "inference_ms_per_step": 1000 * inference_seconds / n,
+            }
+        )
+    return results
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--n_steps", type=int, nargs="+", default=[250, 500, 1000, 2000]
+    )
+    parser.add_argument("--batch_size", type=int, default=1)
+    parser.add_argument("--n_encoder_steps", type=int, default=100)
+    parser.add_argument("-n", "--n_iters", type=int, default=3)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--num_threads", type=int, default=None)
+    return parser.parse_args(args)
+
+
+try:
+    from nbdev.imports import IN_NOTEBOOK
+except:
+    IN_NOTEBOOK = False
+
+if __name__ == "__main__" and not IN_NOTEBOOK:
+    args = parse_args(sys.argv[1:])
+    print(json.dumps(run(**vars(args)), indent=2))
@@ -0,0 +1,119 @@
+__all__ = ["run", "parse_args"]
+
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import torch
+
+from ..data.data import Data, F0_MIN, F0_MAX
+from ..models.common import FILTER_LENGTH, HOP_LENGTH, SAMPLING_RATE
+from ..utils.audio import batched_yin
+from ..utils.utils import load_filepaths_and_text
+
+
+def run(
+    filelist,
+    n_files=20,
+    sampling_rate=SAMPLING_RATE,
+    filter_length=FILTER_LENGTH,
+    hop_length=HOP_LENGTH,
+    f0_min=F0_MIN,
+    f0_max=F0_MAX,
+):
+    """Compare the speed of the pitch backends of Data.get_f0_pvoiced and the agreement of yin with pyin.
+
+    Gross pitch error is the fraction of frames voiced by both backends whose f0s differ by more than 20%.
+    """
+    audiopaths = [fts[0] for fts in load_filepaths_and_text(filelist)][:n_files]
+    data = {
+        backend: Data(
+            audiopaths=audiopaths,
+            return_texts=False,
+            return_mels=False,
+            return_speaker_ids=False,
+            sampling_rate=sampling_rate,
+            filter_length=filter_length,
+            hop_length=hop_length,
+            f0_min=f0_min,
+            f0_max=f0_max,
+            pitch_backend=backend,
+        )
+        for backend in ["pyin", "yin"]
+    }
+    audios = [data["pyin"]._load_audio(a)[0] for a in audiopaths]
+    args = (sampling_rate, filter_length, hop_length, f0_min, f0_max)
+
+    results = {}
+    seconds = {}
+    for backend in ["pyin", "yin"]:
+        start = time.perf_counter()
+        results[backend] = [
+            data[backend].get_f0_pvoiced(audio.numpy(), *args) for audio in audios
+        ]
+        seconds[backend] = time.perf_counter() - start
+
+    batch = torch.nn.utils.rnn.pad_sequence(audios, batch_first=True)
+    start = time.perf_counter()
+    batched_yin(
+        batch,
+        sampling_rate,
+        frame_length=filter_length,
+        win_length=filter_length // 2,
+        hop_length=hop_length,
+        f0_min=f0_min,
+        f0_max=f0_max,
+    )
+    seconds["yin_batched"] = time.perf_counter() - start
+
+    voicing_agreement = []
+    gross_errors = []
+    cents = []
+    for (f0_pyin, voiced_pyin, _), (f0_yin, voiced_yin, _) in zip(
+        results["pyin"], results["yin"]
+    ):
+        voiced_pyin = voiced_pyin.bool().numpy()
+        voiced_yin = voiced_yin.bool().numpy()
+        voicing_agreement.append(voiced_pyin == voiced_yin)
+        both = voiced_pyin & voiced_yin
+        ratio = f0_yin.numpy()[both] / f0_pyin.numpy()[both]
+        gross_errors.append(np.abs(ratio - 1) > 0.2)
+        cents.append(1200 * np.abs(np.log2(ratio)))
+
+    audio_seconds = sum(len(a) for a in audios) / sampling_rate
+    return {
+        "n_files": len(audios),
+        "audio_seconds": audio_seconds,
+        "seconds": seconds,
+        "real_time_factor": {k: v / audio_seconds for k, v in seconds.items()},
+        "voicing_agreement": float(np.concatenate(voicing_agreement).mean()),
+        "gross_pitch_error": float(np.concatenate(gross_errors).mean()),
+        "median_cents": float(np.median(np.concatenate(cents))),
+    }
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-i", "--filelist", help="Path to input filelist", required=True
+    )
+    parser.add_argument("-n", "--n_files", type=int, default=20)
+    parser.add_argument("--sampling_rate", type=int, default=SAMPLING_RATE)
+    parser.add_argument("--filter_length", type=int, default=FILTER_LENGTH)
+    parser.add_argument("--hop_length", type=int, default=HOP_LENGTH)
+    parser.add_argument("--f0_min", type=int, default=F0_MIN)
+    parser.add_argument("--f0_max", type=int, default=F0_MAX)
+    return parser.parse_args(args)
+
+
+try:
+    from nbdev.imports import IN_NOTEBOOK
+except:
+    IN_NOTEBOOK = False
+
+if __name__ == "__main__" and not IN_NOTEBOOK:
+    args = parse_args(sys.argv[1:])
+    print(json.dumps(run(**vars(args)), indent=2))
@@ -0,0 +1,109 @@
+__all__ = ["run", "parse_args"]
+
+
+import argparse
+import json
+import sys
+import time
+
+import torch
+from torch.profiler import profile, ProfilerActivity
+
+from ..models.spectral import (
+    STFT,
+    STFT_BACKENDS,
+    FILTER_LENGTH,
+    HOP_LENGTH,
+    WIN_LENGTH,
+    SAMPLING_RATE,
+)
+
+
+def _allocated_bytes(fn):
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        fn()
+    return sum(
+        e.self_cpu_memory_usage
+        for e in prof.key_averages()
+        if e.self_cpu_memory_usage > 0
+    )
+
+
+def run(
+    seconds=[1.0, 5.0, 10.0],
+    batch_sizes=[1, 8, 32],
+    n_iters=5,
+    sampling_rate=SAMPLING_RATE,
+    filter_length=FILTER_LENGTH,
+    hop_length=HOP_LENGTH,
+    win_length=WIN_LENGTH,
+    num_threads=None,
+):
+    """Compare the CPU speed and allocations of the STFT backends on random clips, and the agreement of their outputs.
+
+    Each case times transform and inverse separately, as the mean over n_iters after one warmup call.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    stfts = {
+        backend: STFT(filter_length, hop_length, win_length, backend=backend)
+        for backend in STFT_BACKENDS
+    }
+    results = []
+    for duration in seconds:
+        for batch_size in batch_sizes:
+            audio = torch.rand(batch_size, int(duration * sampling_rate)) * 2 - 1
+            result = {"seconds": duration, "batch_size": batch_size}
+            outputs = {}
+            for backend, stft in stfts.items():
+                with torch.no_grad():
+                    magnitude, phase = stft.transform(audio)
+                    stft.inverse(magnitude, phase)
+                    start = time.perf_counter()
+                    for _ in range(n_iters):
+                        magnitude, phase = stft.transform(audio)
+                    transform_seconds = (time.perf_counter() - start) / n_iters
+                    start = time.perf_counter()
+                    for _ in range(n_iters):
+                        reconstruction = stft.inverse(magnitude, phase)
+                    inverse_seconds = (time.perf_counter() - start) / n_iters
+                    allocated = _allocated_bytes(
+                        lambda: stft.inverse(*stft.transform(audio))
+                    )
+                outputs[backend] = (magnitude, reconstruction)
+                result[backend] = {
+                    "transform_seconds": transform_seconds,
+                    "inverse_seconds": inverse_seconds,
+                    "allocated_mb": allocated / 2**20,
+                }
+            result["max_magnitude_difference"] = float(
+                (outputs["conv"][0] - outputs["fft"][0]).abs().max()
+            )
+            result["max_reconstruction_difference"] = float(
+                (outputs["conv"][1] - outputs["fft"][1]).abs().max()
+            )
+            results.append(result)
+    return results
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, nargs="+", default=[1.0, 5.0, 10.0])
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("-n", "--n_iters", type=int, default=5)
+    parser.add_argument("--sampling_rate", type=int, default=SAMPLING_RATE)
+    parser.add_argument("--filter_length", type=int, default=FILTER_LENGTH)
+    parser.add_argument("--hop_length", type=int, default=HOP_LENGTH)
+    parser.add_argument("--win_length", type=int, default=WIN_LENGTH)
+    parser.add_argument("--num_threads", type=int, default=None)
+    return parser.parse_args(args)
+
+
+try:
+    from nbdev.imports import IN_NOTEBOOK
+except:
+    IN_NOTEBOOK = False
+
+if __name__ == "__main__" and not IN_NOTEBOOK:
+    args = parse_args(sys.argv[1:])
+    print(json.dumps(run(**vars(args)), indent=2))
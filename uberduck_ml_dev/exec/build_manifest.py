@@ -0,0 +1,32 @@
+__all__ = ["run", "parse_args"]
+
+
+import argparse
+import sys
+
+from ..data.manifest import write_manifest
+
+
+def run(filelist, output, delimiter="|"):
+    """Build the manifest directory of a filelist, which can be passed to Data in place of the filelist."""
+    return write_manifest(filelist, output, split=delimiter)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-i", "--filelist", help="Path to input filelist", required=True
+    )
+    parser.add_argument("-o", "--output", help="Manifest directory", required=True)
+    parser.add_argument("-d", "--delimiter", default="|")
+    return parser.parse_args(args)
+
+
+try:
+    from nbdev.imports import IN_NOTEBOOK
+except:
+    IN_NOTEBOOK = False
+
+if __name__ == "__main__" and not IN_NOTEBOOK:
+    args = parse_args(sys.argv[1:])
+    run(**vars(args))
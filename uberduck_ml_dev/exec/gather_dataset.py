@@ -6,6 +6,7 @@ import os
 from tempfile import NamedTemporaryFile
 from typing import List
 import sys
+import tarfile
 from zipfile import ZipFile
 
 
@@ -30,10 +31,17 @@ def _gather(filelist, output):
         for line in archive_lines:
             tempfile.write(line)
         tempfile.flush()
-        with ZipFile(output, "w") as zf:
-            zf.write(tempfile.name, filelist_archive)
-            for path, archive_path in zip(paths, archive_paths):
-                zf.write(path, archive_path)
+        if output.endswith(".zip"):
+            with ZipFile(output, "w") as zf:
+                zf.write(tempfile.name, filelist_archive)
+                for path, archive_path in zip(paths, archive_paths):
+                    zf.write(path, archive_path)
+        else:
+            # NOTE: the filelist goes first so that data.streaming can read tar shards sequentially.
+            with tarfile.open(output, "w") as tf:
+                tf.add(tempfile.name, filelist_archive)
+                for path, archive_path in zip(paths, archive_paths):
+                    tf.add(path, archive_path)
 
 
 def _parse_args(args: List[str]):
@@ -42,7 +50,7 @@ def _parse_args(args: List[str]):
     parser.add_argument(
         "-o",
         "--output",
-        help="Output zipfile",
+        help="Output zipfile, or tarfile if it doesn't end in .zip",
         default="out.zip",
     )
     return parser.parse_args(args)
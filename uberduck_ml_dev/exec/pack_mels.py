@@ -0,0 +1,67 @@
+__all__ = ["run", "parse_args"]
+
+
+import argparse
+import os
+import sys
+
+import numpy as np
+from tqdm import tqdm
+
+from ..data.store import MemmapStore
+from ..models.common import N_MEL_CHANNELS
+
+
+def run(
+    filelists,
+    base_mels_path,
+    output,
+    input_wavs_dir="",
+    n_mel_channels=N_MEL_CHANNELS,
+):
+    """Pack the per-file .npy mels of HiFi-GAN fine-tuning into a store that MelDataset(base_mels_path=output) reads.
+
+    Keys are the filenames of data.hifigan.get_dataset_filelist without their extension.
+    """
+    keys = set()
+    for filelist in filelists:
+        with open(filelist, encoding="utf-8") as f:
+            keys.update(
+                os.path.splitext(os.path.join(input_wavs_dir, line.split("|")[0]))[0]
+                for line in f.read().split("\n")
+                if len(line) > 0
+            )
+    store = MemmapStore(output, n_channels=n_mel_channels, mode="a")
+    for key in tqdm(sorted(keys)):
+        if key in store:
+            continue
+        mel = np.load(os.path.join(base_mels_path, key + ".npy"))
+        store.append(key, mel.reshape(mel.shape[-2:]).T)
+    store.close()
+    return store
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-i", "--filelists", nargs="+", help="Paths to input filelists", required=True
+    )
+    parser.add_argument(
+        "--base_mels_path", help="Directory of the .npy mels", required=True
+    )
+    parser.add_argument("-o", "--output", help="Path of the mel store", required=True)
+    parser.add_argument(
+        "--input_wavs_dir", default="", help="Directory the filelist paths are in"
+    )
+    parser.add_argument("--n_mel_channels", type=int, default=N_MEL_CHANNELS)
+    return parser.parse_args(args)
+
+
+try:
+    from nbdev.imports import IN_NOTEBOOK
+except:
+    IN_NOTEBOOK = False
+
+if __name__ == "__main__" and not IN_NOTEBOOK:
+    args = parse_args(sys.argv[1:])
+    run(**vars(args))
@@ -0,0 +1,94 @@
+__all__ = ["run", "parse_args"]
+
+
+import argparse
+import os
+import sys
+from multiprocessing import Pool
+
+from tqdm import tqdm
+
+from ..data.data import Data, F0_MIN, F0_MAX, PITCH_BACKENDS
+from ..models.common import FILTER_LENGTH, HOP_LENGTH, SAMPLING_RATE
+from ..utils.utils import load_filepaths_and_text
+
+_data = None
+
+
+def _init_worker(data):
+    global _data
+    _data = data
+
+
+def _compute_f0s(audiopath):
+    return audiopath, _data._compute_f0s(_data._load_audio(audiopath)[0])
+
+
+def run(
+    filelists,
+    f0_cache_path,
+    sampling_rate=SAMPLING_RATE,
+    filter_length=FILTER_LENGTH,
+    hop_length=HOP_LENGTH,
+    f0_min=F0_MIN,
+    f0_max=F0_MAX,
+    pitch_backend="pyin",
+    num_workers=os.cpu_count(),
+):
+    """Compute the f0s of every file in the filelists into the store read by Data(return_f0s=True)."""
+    audiopaths = []
+    for filelist in filelists:
+        audiopaths += [fts[0] for fts in load_filepaths_and_text(filelist)]
+    data = Data(
+        audiopaths=audiopaths,
+        return_texts=False,
+        return_mels=False,
+        return_speaker_ids=False,
+        return_f0s=True,
+        f0_cache_path=f0_cache_path,
+        sampling_rate=sampling_rate,
+        filter_length=filter_length,
+        hop_length=hop_length,
+        f0_min=f0_min,
+        f0_max=f0_max,
+        pitch_backend=pitch_backend,
+    )
+    store = data.f0_store
+    audiopaths = [a for a in sorted(set(audiopaths)) if a not in store]
+    with Pool(num_workers, initializer=_init_worker, initargs=(data,)) as pool:
+        for audiopath, f0s in tqdm(
+            pool.imap_unordered(_compute_f0s, audiopaths), total=len(audiopaths)
+        ):
+            store.append(audiopath, f0s)
+    store.close()
+    return store
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-i", "--filelists", nargs="+", help="Paths to input filelists", required=True
+    )
+    parser.add_argument(
+        "-o", "--f0_cache_path", help="Root directory of f0 stores", required=True
+    )
+    parser.add_argument("--sampling_rate", type=int, default=SAMPLING_RATE)
+    parser.add_argument("--filter_length", type=int, default=FILTER_LENGTH)
+    parser.add_argument("--hop_length", type=int, default=HOP_LENGTH)
+    parser.add_argument("--f0_min", type=int, default=F0_MIN)
+    parser.add_argument("--f0_max", type=int, default=F0_MAX)
+    parser.add_argument("--pitch_backend", default="pyin", choices=PITCH_BACKENDS)
+    parser.add_argument(
+        "-j", "--num_workers", type=int, default=os.cpu_count(), help="Processes"
+    )
+    return parser.parse_args(args)
+
+
+try:
+    from nbdev.imports import IN_NOTEBOOK
+except:
+    IN_NOTEBOOK = False
+
+if __name__ == "__main__" and not IN_NOTEBOOK:
+    args = parse_args(sys.argv[1:])
+    run(**vars(args))
@@ -0,0 +1,90 @@
+__all__ = ["run", "parse_args"]
+
+
+import argparse
+import os
+import sys
+
+from tqdm import tqdm
+
+from ..data.data import Data
+from ..data.store import MemmapStore
+from ..models.common import (
+    FILTER_LENGTH,
+    HOP_LENGTH,
+    WIN_LENGTH,
+    SAMPLING_RATE,
+    N_MEL_CHANNELS,
+    MEL_FMIN,
+    MEL_FMAX,
+)
+from ..utils.utils import load_filepaths_and_text
+
+
+def run(
+    filelists,
+    mel_cache_path,
+    sampling_rate=SAMPLING_RATE,
+    filter_length=FILTER_LENGTH,
+    hop_length=HOP_LENGTH,
+    win_length=WIN_LENGTH,
+    n_mel_channels=N_MEL_CHANNELS,
+    mel_fmin=MEL_FMIN,
+    mel_fmax=MEL_FMAX,
+):
+    """Compute the mels of every file in the filelists into the store read by Data(load_mels=True)."""
+    audiopaths = []
+    for filelist in filelists:
+        audiopaths += [fts[0] for fts in load_filepaths_and_text(filelist)]
+    data = Data(
+        audiopaths=audiopaths,
+        return_texts=False,
+        return_speaker_ids=False,
+        n_mel_channels=n_mel_channels,
+        sampling_rate=sampling_rate,
+        mel_fmin=mel_fmin,
+        mel_fmax=mel_fmax,
+        filter_length=filter_length,
+        hop_length=hop_length,
+        win_length=win_length,
+    )
+    store = MemmapStore(
+        os.path.join(mel_cache_path, data.mel_store_name),
+        n_channels=n_mel_channels,
+        mode="a",
+    )
+    for audiopath in tqdm(sorted(set(audiopaths))):
+        if audiopath in store:
+            continue
+        mel = data._get_mel(data._load_audio(audiopath))
+        store.append(audiopath, mel.numpy().T)
+    store.close()
+    return store
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-i", "--filelists", nargs="+", help="Paths to input filelists", required=True
+    )
+    parser.add_argument(
+        "-o", "--mel_cache_path", help="Root directory of mel stores", required=True
+    )
+    parser.add_argument("--sampling_rate", type=int, default=SAMPLING_RATE)
+    parser.add_argument("--filter_length", type=int, default=FILTER_LENGTH)
+    parser.add_argument("--hop_length", type=int, default=HOP_LENGTH)
+    parser.add_argument("--win_length", type=int, default=WIN_LENGTH)
+    parser.add_argument("--n_mel_channels", type=int, default=N_MEL_CHANNELS)
+    parser.add_argument("--mel_fmin", type=float, default=MEL_FMIN)
+    parser.add_argument("--mel_fmax", type=float, default=MEL_FMAX)
+    return parser.parse_args(args)
+
+
+try:
+    from nbdev.imports import IN_NOTEBOOK
+except:
+    IN_NOTEBOOK = False
+
+if __name__ == "__main__" and not IN_NOTEBOOK:
+    args = parse_args(sys.argv[1:])
+    run(**vars(args))
@@ -0,0 +1,56 @@
+__all__ = ["run", "parse_args"]
+
+
+import argparse
+import json
+import os
+import sys
+
+from scipy.io.wavfile import read
+from tqdm import tqdm
+
+from ..data.hifigan import wav_peak
+
+
+def run(filelists, output, input_wavs_dir=""):
+    """Write the {filename: peak} table read by data.hifigan.MelDataset(peak_table=...).
+
+    Filenames are joined to input_wavs_dir as in data.hifigan.get_dataset_filelist,
+    so that MelDataset can normalize a segment without reading the rest of its file.
+    """
+    filenames = set()
+    for filelist in filelists:
+        with open(filelist, encoding="utf-8") as f:
+            filenames.update(
+                os.path.join(input_wavs_dir, line.split("|")[0])
+                for line in f.read().split("\n")
+                if len(line) > 0
+            )
+    peaks = {}
+    for filename in tqdm(sorted(filenames)):
+        peaks[filename] = wav_peak(read(filename, mmap=True)[1])
+    with open(output, "w") as f:
+        json.dump(peaks, f)
+    return peaks
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-i", "--filelists", nargs="+", help="Paths to input filelists", required=True
+    )
+    parser.add_argument("-o", "--output", help="Path of the peak table", required=True)
+    parser.add_argument(
+        "--input_wavs_dir", default="", help="Directory the filelist paths are in"
+    )
+    return parser.parse_args(args)
+
+
+try:
+    from nbdev.imports import IN_NOTEBOOK
+except:
+    IN_NOTEBOOK = False
+
+if __name__ == "__main__" and not IN_NOTEBOOK:
+    args = parse_args(sys.argv[1:])
+    run(**vars(args))
@@ -25,17 +25,24 @@ __all__ = [
 import numpy as np
 from numpy import finfo
 
-from scipy.signal import get_window
 import torch
-from torch.autograd import Variable
 from torch import nn
 from torch.nn import functional as F
 from torch.nn.utils import remove_weight_norm, weight_norm
 from torch.nn import init
-from librosa.filters import mel as librosa_mel
-from librosa.util import pad_center, tiny
 
 from ..utils.utils import *
+from .spectral import (
+    STFT,
+    MelSTFT,
+    FILTER_LENGTH,
+    HOP_LENGTH,
+    WIN_LENGTH,
+    N_MEL_CHANNELS,
+    SAMPLING_RATE,
+    MEL_FMIN,
+    MEL_FMAX,
+)
 
 
 class Conv1d(nn.Module):
@@ -108,243 +115,6 @@ class LocationLayer(nn.Module):
         return processed_attention
 
 
-FILTER_LENGTH = 1024
-HOP_LENGTH = 256
-WIN_LENGTH = 1024
-N_MEL_CHANNELS = 80
-SAMPLING_RATE = 22050
-
-# NOTE (Sam): STFTs should get their own file in common folder
-class STFT:
-    """adapted from Prem Seetharaman's https://github.com/pseeth/pytorch-stft"""
-
-    def __init__(
-        self,
-        filter_length=FILTER_LENGTH,
-        hop_length=HOP_LENGTH,
-        win_length=WIN_LENGTH,
-        window="hann",
-        padding=None,
-        device="cpu",
-        rank=None,
-    ):
-        self.filter_length = filter_length
-        self.hop_length = hop_length
-        self.win_length = win_length
-        self.window = window
-        self.forward_transform = None
-        scale = self.filter_length / self.hop_length
-        fourier_basis = np.fft.fft(np.eye(self.filter_length))
-
-        self.padding = padding or (filter_length // 2)
-
-        cutoff = int((self.filter_length / 2 + 1))
-        fourier_basis = np.vstack(
-            [np.real(fourier_basis[:cutoff, :]), np.imag(fourier_basis[:cutoff, :])]
-        )
-
-        if device == "cuda":
-            dev = torch.device(f"cuda:{rank}")
-            forward_basis = torch.cuda.FloatTensor(
-                fourier_basis[:, None, :], device=dev
-            )
-            inverse_basis = torch.cuda.FloatTensor(
-                np.linalg.pinv(scale * fourier_basis).T[:, None, :].astype(np.float32),
-                device=dev,
-            )
-        else:
-            forward_basis = torch.FloatTensor(fourier_basis[:, None, :])
-            inverse_basis = torch.FloatTensor(
-                np.linalg.pinv(scale * fourier_basis).T[:, None, :].astype(np.float32)
-            )
-
-        if window is not None:
-            assert filter_length >= win_length
-            # get window and zero center pad it to filter_length
-            fft_window = get_window(window, win_length, fftbins=True)
-            fft_window = pad_center(fft_window, filter_length)
-            fft_window = torch.from_numpy(fft_window).float()
-
-            if device == "cuda":
-                fft_window = fft_window.cuda(rank)
-
-            # window the bases
-            forward_basis *= fft_window
-            inverse_basis *= fft_window
-            self.fft_window = fft_window
-
-        self.forward_basis = forward_basis.float()
-        self.inverse_basis = inverse_basis.float()
-
-    def transform(self, input_data):
-        num_batches = input_data.size(0)
-        num_samples = input_data.size(1)
-
-        self.num_samples = num_samples
-
-        # similar to librosa, reflect-pad the input
-        input_data = input_data.view(num_batches, 1, num_samples)
-        input_data = F.pad(
-            input_data.unsqueeze(1),
-            (
-                self.padding,
-                self.padding,
-                0,
-                0,
-            ),
-            mode="reflect",
-        )
-        input_data = input_data.squeeze(1)
-
-        forward_transform = F.conv1d(
-            input_data,
-            Variable(self.forward_basis, requires_grad=False),
-            stride=self.hop_length,
-            padding=0,
-        )
-
-        cutoff = self.filter_length // 2 + 1
-        real_part = forward_transform[:, :cutoff, :]
-        imag_part = forward_transform[:, cutoff:, :]
-
-        magnitude = torch.sqrt(real_part**2 + imag_part**2)
-        phase = torch.autograd.Variable(torch.atan2(imag_part.data, real_part.data))
-
-        return magnitude, phase
-
-    def inverse(self, magnitude, phase):
-        recombine_magnitude_phase = torch.cat(
-            [magnitude * torch.cos(phase), magnitude * torch.sin(phase)],
-            dim=1,
-        )
-
-        inverse_transform = F.conv_transpose1d(
-            recombine_magnitude_phase,
-            Variable(self.inverse_basis, requires_grad=False),
-            stride=self.hop_length,
-            padding=0,
-        )
-
-        if self.window is not None:
-            window_sum = window_sumsquare(
-                self.window,
-                magnitude.size(-1),
-                hop_length=self.hop_length,
-                win_length=self.win_length,
-                n_fft=self.filter_length,
-                dtype=np.float32,
-            )
-            # remove modulation effects
-            approx_nonzero_indices = torch.from_numpy(
-                np.where(window_sum > tiny(window_sum))[0]
-            )
-            window_sum = torch.autograd.Variable(
-                torch.from_numpy(window_sum), requires_grad=False
-            )
-            window_sum = window_sum.cuda() if magnitude.is_cuda else window_sum
-            inverse_transform[:, :, approx_nonzero_indices] /= window_sum[
-                approx_nonzero_indices
-            ]
-
-            # scale by hop ratio
-            inverse_transform *= float(self.filter_length) / self.hop_length
-
-        inverse_transform = inverse_transform[:, :, int(self.filter_length / 2) :]
-        inverse_transform = inverse_transform[:, :, : -int(self.filter_length / 2) :]
-
-        return inverse_transform
-
-    def forward(self, input_data):
-        self.magnitude, self.phase = self.transform(input_data)
-        reconstruction = self.inverse(self.magnitude, self.phase)
-        return reconstruction
-
-
-MEL_FMIN = 0.0
-MEL_FMAX = 8000.0
-
-
-class MelSTFT:
-    def __init__(
-        self,
-        filter_length=FILTER_LENGTH,
-        hop_length=HOP_LENGTH,
-        win_length=WIN_LENGTH,
-        n_mel_channels=N_MEL_CHANNELS,
-        sampling_rate=SAMPLING_RATE,
-        mel_fmin=MEL_FMIN,
-        mel_fmax=MEL_FMAX,
-        device="cpu",
-        padding=None,
-        rank=None,
-    ):
-        self.n_mel_channels = n_mel_channels
-        self.sampling_rate = sampling_rate
-        if padding is None:
-            padding = filter_length // 2
-
-        self.stft_fn = STFT(
-            filter_length,
-            hop_length,
-            win_length,
-            device=device,
-            rank=rank,
-            padding=padding,
-        )
-        mel_basis = librosa_mel(
-            sampling_rate, filter_length, n_mel_channels, mel_fmin, mel_fmax
-        )
-        mel_basis = torch.from_numpy(mel_basis).float()
-        if device == "cuda":
-            mel_basis = mel_basis.cuda()
-        self.mel_basis = mel_basis
-
-    def spectral_normalize(self, magnitudes):
-        output = dynamic_range_compression(magnitudes)
-        return output
-
-    def spectral_de_normalize(self, magnitudes):
-        output = dynamic_range_decompression(magnitudes)
-        return output
-
-    def spec_to_mel(self, spec):
-        mel_output = torch.matmul(self.mel_basis, spec)
-        mel_output = self.spectral_normalize(mel_output)
-        return mel_output
-
-    def spectrogram(self, y):
-        assert y.min() >= -1
-        assert y.max() <= 1
-        magnitudes, phases = self.stft_fn.transform(y)
-        return magnitudes.data
-
-    def mel_spectrogram(self, y, ref_level_db=20, magnitude_power=1.5):
-        """Computes mel-spectrograms from a batch of waves
-        PARAMS
-        ------
-        y: Variable(torch.FloatTensor) with shape (B, T) in range [-1, 1]
-
-        RETURNS
-        -------
-        mel_output: torch.FloatTensor of shape (B, n_mel_channels, T)
-        """
-        assert y.min() >= -1
-        assert y.max() <= 1
-
-        magnitudes, phases = self.stft_fn.transform(y)
-        magnitudes = magnitudes.data
-        return self.spec_to_mel(magnitudes)
-
-    def griffin_lim(self, mel_spectrogram, n_iters=30):
-        mel_dec = self.spectral_de_normalize(mel_spectrogram)
-        # Float cast required for fp16 training.
-        mel_dec = mel_dec.transpose(0, 1).cpu().data.float()
-        spec_from_mel = torch.mm(mel_dec, self.mel_basis).transpose(0, 1)
-        spec_from_mel *= 1000
-        out = griffin_lim(spec_from_mel.unsqueeze(0), self.stft_fn, n_iters=n_iters)
-        return out
-
-
 class ReferenceEncoder(nn.Module):
     """
     inputs --- [N, Ty/r, n_mels*r]  mels
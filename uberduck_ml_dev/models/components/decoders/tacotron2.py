@@ -28,6 +28,7 @@ class Decoder(nn.Module):
         self.p_decoder_dropout = hparams.p_decoder_dropout
         self.p_teacher_forcing = hparams.p_teacher_forcing
         self.cudnn_enabled = hparams.cudnn_enabled
+        self.compact_inference = hparams.compact_inference
         self.attention_hidden = torch.tensor([])
         self.attention_cell = torch.tensor([])
         self.decoder_hidden = torch.tensor([])
@@ -118,6 +119,24 @@ class Decoder(nn.Module):
         self.processed_memory = self.attention_layer.memory_layer(memory)
         self.mask = mask
 
+    def select_decoder_states(self, index):
+        """Keeps only the batch rows in index of the rnn states, attention weights, attention context, memory,
+        processed memory and mask
+        PARAMS
+        ------
+        index: (B',) indices of the rows to keep
+        """
+        self.attention_hidden = self.attention_hidden[index]
+        self.attention_cell = self.attention_cell[index]
+        self.decoder_hidden = self.decoder_hidden[index]
+        self.decoder_cell = self.decoder_cell[index]
+        self.attention_weights = self.attention_weights[index]
+        self.attention_weights_cum = self.attention_weights_cum[index]
+        self.attention_context = self.attention_context[index]
+        self.memory = self.memory[index]
+        self.processed_memory = self.processed_memory[index]
+        self.mask = self.mask[index]
+
     #   NOTE (Sam): spaghetti code - comment this out after removing dependency in partial_tf index
     def parse_decoder_inputs(self, decoder_inputs):
         """Prepares decoder inputs, i.e. mel outputs
@@ -178,6 +197,42 @@ class Decoder(nn.Module):
 
         return mel_outputs, gate_outputs, alignments
 
+    def allocate_decoder_outputs(self, memory, n_steps: int):
+        """Preallocates the outputs of n_steps decoder steps, to be filled in place and trimmed by trim_decoder_outputs
+        PARAMS
+        ------
+        memory: Encoder outputs
+        n_steps: maximum number of decoder steps
+
+        RETURNS
+        -------
+        mel_outputs: (B, n_steps, n_mel_channels * n_frames_per_step)
+        gate_outputs: (B, n_steps, n_frames_per_step)
+        alignments: (B, n_steps, MAX_TIME)
+        """
+        B = memory.size(0)
+        mel_outputs = memory.new_empty(
+            B, n_steps, self.n_frames_per_step_current * self.n_mel_channels
+        )
+        gate_outputs = memory.new_empty(B, n_steps, self.n_frames_per_step_current)
+        alignments = memory.new_empty(B, n_steps, memory.size(1))
+        return mel_outputs, gate_outputs, alignments
+
+    def trim_decoder_outputs(self, mel_outputs, gate_outputs, alignments, n_steps: int):
+        """Trims the buffers of allocate_decoder_outputs to n_steps and lays them out like parse_decoder_outputs
+        RETURNS
+        -------
+        mel_outputs: (B, n_mel_channels, n_steps * n_frames_per_step)
+        gate_outputs: (B, n_steps * n_frames_per_step)
+        alignments: (B, n_steps, MAX_TIME)
+        """
+        B = mel_outputs.size(0)
+        mel_outputs = mel_outputs[:, :n_steps].reshape(B, -1, self.n_mel_channels)
+        mel_outputs = mel_outputs.transpose(1, 2)
+        gate_outputs = gate_outputs[:, :n_steps].reshape(B, -1)
+        alignments = alignments[:, :n_steps]
+        return mel_outputs, gate_outputs, alignments
+
     def decode(self, decoder_input, attention_weights: Optional[torch.Tensor]):
         """Decoder step using stored states, attention and memory
         PARAMS
@@ -252,7 +307,6 @@ class Decoder(nn.Module):
         gate_outputs: gate outputs from the decoder
         alignments: sequence of attention weights from the decoder
         """
-        B = memory.size(0)
         decoder_inputs = rearrange(
             decoder_inputs, "b m t -> t b m"
         )  # n_frames_per_step not used anymore
@@ -264,20 +318,17 @@ class Decoder(nn.Module):
             memory, mask=~get_mask_from_lengths(memory_lengths)
         )
 
-        mel_outputs = torch.empty(
-            B, 0, self.n_frames_per_step_current * self.n_mel_channels
-        )
-        if self.cudnn_enabled:
-            mel_outputs = mel_outputs.cuda()
-        gate_outputs, alignments = [], []
+        # NOTE: the outputs are stacked once at the end. Unlike inference, this doesn't fill a preallocated
+        # buffer in place, since backpropagating through in-place writes copies the whole buffer at every step.
+        mel_outputs, gate_outputs, alignments = [], [], []
         desired_output_frames = decoder_inputs.size(0) / self.n_frames_per_step_current
-        while mel_outputs.size(1) < desired_output_frames - 1:
+        while len(mel_outputs) < desired_output_frames - 1:
             if (
-                mel_outputs.size(1) == 0
+                len(mel_outputs) == 0
                 or np.random.uniform(0.0, 1.0) <= self.p_teacher_forcing
             ):
                 teacher_forced_frame = decoder_inputs[
-                    mel_outputs.size(1) * self.n_frames_per_step_current
+                    len(mel_outputs) * self.n_frames_per_step_current
                 ]
 
                 decoder_input = teacher_forced_frame
@@ -287,7 +338,7 @@ class Decoder(nn.Module):
                 # it's easy to retrieve the last n_frames_per_step_init frames.
                 to_concat = (
                     self.prenet(
-                        mel_outputs[:, -1, -1 * self.n_frames_per_step_current :]
+                        mel_outputs[-1][:, -1 * self.n_frames_per_step_current :]
                     ),
                 )
                 decoder_input = torch.cat(to_concat, dim=1)
@@ -298,20 +349,14 @@ class Decoder(nn.Module):
                 mel_output, gate_output, attention_weights = self.decode(
                     decoder_input, None
                 )
-            mel_outputs = torch.cat(
-                [
-                    mel_outputs,
-                    mel_output[
-                        :, 0 : self.n_mel_channels * self.n_frames_per_step_current
-                    ].unsqueeze(1),
-                ],
-                dim=1,
-            )
+            mel_outputs += [
+                mel_output[:, 0 : self.n_mel_channels * self.n_frames_per_step_current]
+            ]
             gate_outputs += [gate_output.squeeze()] * self.n_frames_per_step_current
             alignments += [attention_weights]
 
         mel_outputs, gate_outputs, alignments = self.parse_decoder_outputs(
-            mel_outputs, gate_outputs, alignments
+            torch.stack(mel_outputs, dim=1), gate_outputs, alignments
         )
 
         return mel_outputs, gate_outputs, alignments
@@ -327,19 +372,24 @@ class Decoder(nn.Module):
         mel_outputs: mel outputs from the decoder
         gate_outputs: gate outputs from the decoder
         alignments: sequence of attention weights from the decoder
+
+        With compact_inference, rows are removed from the decoder states as soon as they emit a stop gate,
+        so a batch costs the sum of its lengths rather than the batch size times the longest length. The
+        outputs of a row past its stop step are then zero mels, zero alignments and gates of 1e3 (as
+        Tacotron2.mask_output sets them) instead of the continued decoding.
         """
         decoder_input = self.get_go_frame(memory)
         self.initialize_decoder_states(
             memory, mask=~get_mask_from_lengths(memory_lengths)
         )
 
-        B = memory.size(0)
-        mel_outputs = torch.empty(
-            B, 0, self.n_frames_per_step_current * self.n_mel_channels
+        mel_outputs, gate_outputs, alignments = self.allocate_decoder_outputs(
+            memory, self.max_decoder_steps
         )
-        if self.cudnn_enabled:
-            mel_outputs = mel_outputs.cuda()
-        gate_outputs, alignments = [], []
+        if self.compact_inference:
+            mel_outputs.zero_()
+            gate_outputs.fill_(1e3)
+            alignments.zero_()
 
         mel_lengths = torch.zeros(
             [memory.size(0)], dtype=torch.int32, device=memory.device
@@ -347,17 +397,20 @@ class Decoder(nn.Module):
         not_finished = torch.ones(
             [memory.size(0)], dtype=torch.int32, device=memory.device
         )
+        rows = torch.arange(memory.size(0), device=memory.device)
 
+        n_steps = 0
         while True:
             decoder_input = self.prenet(decoder_input)
             mel_output, gate_output, alignment = self.decode(decoder_input, None)
             mel_output = mel_output[
                 :, 0 : self.n_mel_channels * self.n_frames_per_step_current
-            ].unsqueeze(1)
+            ]
 
-            mel_outputs = torch.cat([mel_outputs, mel_output], dim=1)
-            gate_outputs += [gate_output.squeeze()] * self.n_frames_per_step_current
-            alignments += [alignment]
+            mel_outputs[rows, n_steps] = mel_output
+            gate_outputs[rows, n_steps] = gate_output
+            alignments[rows, n_steps] = alignment
+            n_steps += 1
 
             dec = (
                 torch.le(torch.sigmoid(gate_output), self.gate_threshold)
@@ -366,17 +419,24 @@ class Decoder(nn.Module):
             )
 
             not_finished = not_finished * dec
-            mel_lengths += not_finished
+            mel_lengths.index_add_(0, rows, not_finished)
 
-            if torch.sum(not_finished) == 0:
+            n_not_finished = int(torch.sum(not_finished))
+            if n_not_finished == 0:
                 break
-            if mel_outputs.shape[1] == self.max_decoder_steps:
+            if n_steps == self.max_decoder_steps:
                 print("Warning! Reached max decoder steps")
                 break
 
-            decoder_input = mel_output[:, -1, -1 * self.n_mel_channels :]
-        mel_outputs, gate_outputs, alignments = self.parse_decoder_outputs(
-            mel_outputs, gate_outputs, alignments
+            decoder_input = mel_output[:, -1 * self.n_mel_channels :]
+            if self.compact_inference and n_not_finished < rows.size(0):
+                keep = torch.nonzero(not_finished).squeeze(1)
+                self.select_decoder_states(keep)
+                rows = rows[keep]
+                not_finished = not_finished[keep]
+                decoder_input = decoder_input[keep]
+        mel_outputs, gate_outputs, alignments = self.trim_decoder_outputs(
+            mel_outputs, gate_outputs, alignments, n_steps
         )
 
         return mel_outputs, gate_outputs, alignments, mel_lengths
@@ -397,13 +457,9 @@ class Decoder(nn.Module):
 
         self.initialize_decoder_states(memory, mask=None)
 
-        B = memory.size(0)
-        mel_outputs = torch.empty(
-            B, 0, self.n_frames_per_step_current * self.n_mel_channels
+        mel_outputs, gate_outputs, alignments = self.allocate_decoder_outputs(
+            memory, len(attention_map)
         )
-        if self.cudnn_enabled:
-            mel_outputs = mel_outputs.cuda()
-        gate_outputs, alignments = [], []
         for i in range(len(attention_map)):
 
             attention = attention_map[i]
@@ -411,16 +467,16 @@ class Decoder(nn.Module):
             mel_output, gate_output, alignment = self.decode(decoder_input, attention)
             mel_output = mel_output[
                 :, 0 : self.n_mel_channels * self.n_frames_per_step_current
-            ].unsqueeze(1)
+            ]
 
-            mel_outputs = torch.cat([mel_outputs, mel_output], dim=1)
-            gate_outputs += [gate_output.squeeze()] * self.n_frames_per_step_current
-            alignments += [alignment]
+            mel_outputs[:, i] = mel_output
+            gate_outputs[:, i] = gate_output
+            alignments[:, i] = alignment
 
-            decoder_input = mel_output[:, -1, -1 * self.n_mel_channels :]
+            decoder_input = mel_output[:, -1 * self.n_mel_channels :]
 
-        mel_outputs, gate_outputs, alignments = self.parse_decoder_outputs(
-            mel_outputs, gate_outputs, alignments
+        mel_outputs, gate_outputs, alignments = self.trim_decoder_outputs(
+            mel_outputs, gate_outputs, alignments, len(attention_map)
         )
 
         return mel_outputs, gate_outputs, alignments
@@ -477,7 +533,6 @@ class Decoder(nn.Module):
         if device == "cuda" and self.cudnn_enabled:
             decoder_inputs = decoder_inputs.cuda()
 
-        B = memory.size(0)
         decoder_inputs = self.parse_decoder_inputs(decoder_inputs)
         decoder_inputs = decoder_inputs.reshape(
             -1, decoder_inputs.size(1), self.n_mel_channels
@@ -488,47 +543,39 @@ class Decoder(nn.Module):
 
         self.initialize_decoder_states(memory, mask=None)
 
-        mel_outputs = torch.empty(
-            B, 0, self.n_frames_per_step_current * self.n_mel_channels
+        mel_outputs, gate_outputs, alignments = self.allocate_decoder_outputs(
+            memory, self.max_decoder_steps
         )
-        if device == "cuda" and self.cudnn_enabled:
-            mel_outputs = mel_outputs.cuda()
-        gate_outputs, alignments = [], []
 
+        n_steps = 0
         while True:
-            if mel_outputs.size(1) < tf_until_idx:
+            if n_steps < tf_until_idx:
                 teacher_forced_frame = decoder_inputs[
-                    mel_outputs.size(1) * self.n_frames_per_step_current
+                    n_steps * self.n_frames_per_step_current
                 ]
 
                 decoder_input = teacher_forced_frame
             else:
 
-                decoder_input = self.prenet(
-                    mel_outputs[:, -1, -1 * self.n_mel_channels :]
-                )
+                decoder_input = self.prenet(mel_output[:, -1 * self.n_mel_channels :])
             mel_output, gate_output, attention_weights = self.decode(
                 decoder_input, None
             )
-            mel_outputs = torch.cat(
-                [
-                    mel_outputs,
-                    mel_output[
-                        :, 0 : self.n_mel_channels * self.n_frames_per_step_current
-                    ].unsqueeze(1),
-                ],
-                dim=1,
-            )
-            gate_outputs += [gate_output.squeeze()] * self.n_frames_per_step_current
-            alignments += [attention_weights]
+            mel_output = mel_output[
+                :, 0 : self.n_mel_channels * self.n_frames_per_step_current
+            ]
+            mel_outputs[:, n_steps] = mel_output
+            gate_outputs[:, n_steps] = gate_output
+            alignments[:, n_steps] = attention_weights
+            n_steps += 1
             if torch.sigmoid(gate_output.data) > self.gate_threshold:
                 break
-            elif mel_outputs.size(1) == self.max_decoder_steps:
+            elif n_steps == self.max_decoder_steps:
                 print("Warning! Reached max decoder steps")
                 break
 
-        mel_outputs, gate_outputs, alignments = self.parse_decoder_outputs(
-            mel_outputs, gate_outputs, alignments
+        mel_outputs, gate_outputs, alignments = self.trim_decoder_outputs(
+            mel_outputs, gate_outputs, alignments, n_steps
         )
 
         return mel_outputs, gate_outputs, alignments
@@ -0,0 +1,417 @@
+__all__ = [
+    "FILTER_LENGTH",
+    "HOP_LENGTH",
+    "WIN_LENGTH",
+    "N_MEL_CHANNELS",
+    "SAMPLING_RATE",
+    "MEL_FMIN",
+    "MEL_FMAX",
+    "stft_window",
+    "fourier_bases",
+    "mel_filterbank",
+    "window_normalization",
+    "get_mel_stft",
+    "STFT_BACKENDS",
+    "STFT",
+    "MelSTFT",
+]
+
+from functools import lru_cache
+
+import numpy as np
+from scipy.signal import get_window
+import torch
+from torch.autograd import Variable
+from torch.nn import functional as F
+from librosa.filters import mel as librosa_mel
+from librosa.util import pad_center
+
+from ..utils.utils import (
+    window_sumsquare_torch,
+    griffin_lim,
+    dynamic_range_compression,
+    dynamic_range_decompression,
+)
+
+FILTER_LENGTH = 1024
+HOP_LENGTH = 256
+WIN_LENGTH = 1024
+N_MEL_CHANNELS = 80
+SAMPLING_RATE = 22050
+MEL_FMIN = 0.0
+MEL_FMAX = 8000.0
+# NOTE: one gain tensor per clip length, so only the most recently used lengths are kept.
+WINDOW_NORMALIZATION_CACHE_SIZE = 32
+
+
+# NOTE: process-wide caches of spectral constants. The cached tensors are shared, so never modify them in place.
+def _resolve_device(device, rank=None):
+    if str(device) == "cuda" and rank is not None:
+        return torch.device(f"cuda:{rank}")
+    return torch.device(device)
+
+
+@lru_cache(maxsize=None)
+def _stft_window(window, win_length, n_fft, device, dtype):
+    if device != "cpu" or dtype != torch.float32:
+        return _stft_window(window, win_length, n_fft, "cpu", torch.float32).to(
+            device, dtype
+        )
+    fft_window = get_window(window, win_length, fftbins=True)
+    if n_fft is not None:
+        assert n_fft >= win_length
+        # zero center pad it to n_fft.
+        fft_window = pad_center(fft_window, n_fft)
+    return torch.from_numpy(fft_window).float()
+
+
+def stft_window(
+    window="hann", win_length=WIN_LENGTH, n_fft=None, device="cpu", dtype=torch.float32
+):
+    """Return the periodic window of win_length samples, zero center padded to n_fft if given."""
+    return _stft_window(window, win_length, n_fft, str(torch.device(device)), dtype)
+
+
+@lru_cache(maxsize=None)
+def _fourier_bases(filter_length, hop_length, win_length, window, device, dtype):
+    if device != "cpu" or dtype != torch.float32:
+        return tuple(
+            basis.to(device, dtype)
+            for basis in _fourier_bases(
+                filter_length, hop_length, win_length, window, "cpu", torch.float32
+            )
+        )
+    scale = filter_length / hop_length
+    fourier_basis = np.fft.fft(np.eye(filter_length))
+    cutoff = int((filter_length / 2 + 1))
+    fourier_basis = np.vstack(
+        [np.real(fourier_basis[:cutoff, :]), np.imag(fourier_basis[:cutoff, :])]
+    )
+    forward_basis = torch.FloatTensor(fourier_basis[:, None, :])
+    inverse_basis = torch.FloatTensor(
+        np.linalg.pinv(scale * fourier_basis).T[:, None, :].astype(np.float32)
+    )
+    if window is not None:
+        fft_window = _stft_window(window, win_length, filter_length, "cpu", dtype)
+        forward_basis *= fft_window
+        inverse_basis *= fft_window
+    return forward_basis, inverse_basis
+
+
+def fourier_bases(
+    filter_length=FILTER_LENGTH,
+    hop_length=HOP_LENGTH,
+    win_length=WIN_LENGTH,
+    window="hann",
+    device="cpu",
+    dtype=torch.float32,
+):
+    """Return the windowed forward and inverse STFT bases of shape (filter_length + 2, 1, filter_length)."""
+    return _fourier_bases(
+        filter_length, hop_length, win_length, window, str(torch.device(device)), dtype
+    )
+
+
+@lru_cache(maxsize=None)
+def _mel_filterbank(sampling_rate, n_fft, n_mels, fmin, fmax, device, dtype):
+    if device != "cpu" or dtype != torch.float32:
+        return _mel_filterbank(
+            sampling_rate, n_fft, n_mels, fmin, fmax, "cpu", torch.float32
+        ).to(device, dtype)
+    mel_basis = librosa_mel(sampling_rate, n_fft, n_mels, fmin, fmax)
+    return torch.from_numpy(mel_basis).float()
+
+
+def mel_filterbank(
+    sampling_rate=SAMPLING_RATE,
+    n_fft=FILTER_LENGTH,
+    n_mels=N_MEL_CHANNELS,
+    fmin=MEL_FMIN,
+    fmax=MEL_FMAX,
+    device="cpu",
+    dtype=torch.float32,
+):
+    """Return the (n_mels, n_fft // 2 + 1) librosa mel filterbank."""
+    return _mel_filterbank(
+        sampling_rate, n_fft, n_mels, fmin, fmax, str(torch.device(device)), dtype
+    )
+
+
+@lru_cache(maxsize=WINDOW_NORMALIZATION_CACHE_SIZE)
+def _window_normalization(
+    window, n_frames, hop_length, win_length, n_fft, device, dtype
+):
+    window_sum = window_sumsquare_torch(
+        _stft_window(window, win_length, n_fft, device, dtype),
+        n_frames,
+        hop_length=hop_length,
+    )
+    # remove modulation effects where the envelope is nonzero, and scale by the hop ratio everywhere.
+    nonzero = window_sum > torch.finfo(dtype).tiny
+    normalization = torch.where(nonzero, 1 / window_sum, torch.ones_like(window_sum))
+    return normalization * (float(n_fft) / hop_length)
+
+
+def window_normalization(
+    n_frames,
+    window="hann",
+    hop_length=HOP_LENGTH,
+    win_length=WIN_LENGTH,
+    n_fft=FILTER_LENGTH,
+    device="cpu",
+    dtype=torch.float32,
+):
+    """Return the (n_fft + hop_length * (n_frames - 1),) gain applied to the overlap-added inverse STFT of n_frames frames."""
+    return _window_normalization(
+        window,
+        n_frames,
+        hop_length,
+        win_length,
+        n_fft,
+        str(torch.device(device)),
+        dtype,
+    )
+
+
+STFT_BACKENDS = ["conv", "fft"]
+
+
+class STFT:
+    """adapted from Prem Seetharaman's https://github.com/pseeth/pytorch-stft
+
+    backend "conv" computes the transform as a conv1d with the dense Fourier basis (and the inverse as a conv_transpose1d),
+    "fft" uses torch.stft and torch.istft with the same window, padding and normalization.
+    """
+
+    def __init__(
+        self,
+        filter_length=FILTER_LENGTH,
+        hop_length=HOP_LENGTH,
+        win_length=WIN_LENGTH,
+        window="hann",
+        padding=None,
+        device="cpu",
+        rank=None,
+        backend="conv",
+    ):
+        assert backend in STFT_BACKENDS, f"backend must be one of {STFT_BACKENDS}"
+        assert (
+            backend == "conv" or window is not None
+        ), "the fft backend requires a window"
+        self.backend = backend
+        self.filter_length = filter_length
+        self.hop_length = hop_length
+        self.win_length = win_length
+        self.window = window
+        self.forward_transform = None
+        self.padding = padding or (filter_length // 2)
+
+        device = _resolve_device(device, rank)
+        self.forward_basis, self.inverse_basis = fourier_bases(
+            filter_length, hop_length, win_length, window, device=device
+        )
+        if window is not None:
+            self.fft_window = stft_window(
+                window, win_length, filter_length, device=device
+            )
+
+    def transform(self, input_data):
+        num_batches = input_data.size(0)
+        num_samples = input_data.size(1)
+
+        self.num_samples = num_samples
+
+        # similar to librosa, reflect-pad the input
+        input_data = input_data.view(num_batches, 1, num_samples)
+        input_data = F.pad(
+            input_data.unsqueeze(1),
+            (
+                self.padding,
+                self.padding,
+                0,
+                0,
+            ),
+            mode="reflect",
+        )
+        input_data = input_data.squeeze(1)
+
+        if self.backend == "fft":
+            spec = torch.stft(
+                input_data[:, 0],
+                self.filter_length,
+                hop_length=self.hop_length,
+                win_length=self.filter_length,
+                window=self.fft_window,
+                center=False,
+                return_complex=True,
+            )
+            return spec.abs(), spec.angle()
+
+        forward_transform = F.conv1d(
+            input_data,
+            Variable(self.forward_basis, requires_grad=False),
+            stride=self.hop_length,
+            padding=0,
+        )
+
+        cutoff = self.filter_length // 2 + 1
+        real_part = forward_transform[:, :cutoff, :]
+        imag_part = forward_transform[:, cutoff:, :]
+
+        magnitude = torch.sqrt(real_part**2 + imag_part**2)
+        phase = torch.autograd.Variable(torch.atan2(imag_part.data, real_part.data))
+
+        return magnitude, phase
+
+    def inverse(self, magnitude, phase):
+        if self.backend == "fft":
+            # NOTE: istft divides by the window sum-square and trims filter_length // 2 on both ends like the conv inverse.
+            inverse_transform = torch.istft(
+                torch.polar(magnitude, phase),
+                self.filter_length,
+                hop_length=self.hop_length,
+                win_length=self.filter_length,
+                window=self.fft_window,
+                center=True,
+                length=(magnitude.size(-1) - 1) * self.hop_length,
+            )
+            return inverse_transform.unsqueeze(1)
+
+        recombine_magnitude_phase = torch.cat(
+            [magnitude * torch.cos(phase), magnitude * torch.sin(phase)],
+            dim=1,
+        )
+
+        inverse_transform = F.conv_transpose1d(
+            recombine_magnitude_phase,
+            Variable(self.inverse_basis, requires_grad=False),
+            stride=self.hop_length,
+            padding=0,
+        )
+
+        if self.window is not None:
+            inverse_transform = inverse_transform * window_normalization(
+                magnitude.size(-1),
+                self.window,
+                self.hop_length,
+                self.win_length,
+                self.filter_length,
+                device=inverse_transform.device,
+                dtype=inverse_transform.dtype,
+            )
+
+        inverse_transform = inverse_transform[:, :, int(self.filter_length / 2) :]
+        inverse_transform = inverse_transform[:, :, : -int(self.filter_length / 2) :]
+
+        return inverse_transform
+
+    def forward(self, input_data):
+        self.magnitude, self.phase = self.transform(input_data)
+        reconstruction = self.inverse(self.magnitude, self.phase)
+        return reconstruction
+
+
+class MelSTFT:
+    def __init__(
+        self,
+        filter_length=FILTER_LENGTH,
+        hop_length=HOP_LENGTH,
+        win_length=WIN_LENGTH,
+        n_mel_channels=N_MEL_CHANNELS,
+        sampling_rate=SAMPLING_RATE,
+        mel_fmin=MEL_FMIN,
+        mel_fmax=MEL_FMAX,
+        device="cpu",
+        padding=None,
+        rank=None,
+        stft_backend="conv",
+    ):
+        self.n_mel_channels = n_mel_channels
+        self.sampling_rate = sampling_rate
+        if padding is None:
+            padding = filter_length // 2
+
+        self.stft_fn = STFT(
+            filter_length,
+            hop_length,
+            win_length,
+            device=device,
+            rank=rank,
+            padding=padding,
+            backend=stft_backend,
+        )
+        self.mel_basis = mel_filterbank(
+            sampling_rate,
+            filter_length,
+            n_mel_channels,
+            mel_fmin,
+            mel_fmax,
+            device=_resolve_device(device, rank),
+        )
+
+    def spectral_normalize(self, magnitudes):
+        output = dynamic_range_compression(magnitudes)
+        return output
+
+    def spectral_de_normalize(self, magnitudes):
+        output = dynamic_range_decompression(magnitudes)
+        return output
+
+    def spec_to_mel(self, spec):
+        mel_output = torch.matmul(self.mel_basis, spec)
+        mel_output = self.spectral_normalize(mel_output)
+        return mel_output
+
+    def spectrogram(self, y):
+        assert y.min() >= -1
+        assert y.max() <= 1
+        magnitudes, phases = self.stft_fn.transform(y)
+        return magnitudes.data
+
+    def mel_spectrogram(self, y, ref_level_db=20, magnitude_power=1.5):
+        """Computes mel-spectrograms from a batch of waves
+        PARAMS
+        ------
+        y: Variable(torch.FloatTensor) with shape (B, T) in range [-1, 1]
+
+        RETURNS
+        -------
+        mel_output: torch.FloatTensor of shape (B, n_mel_channels, T)
+        """
+        assert y.min() >= -1
+        assert y.max() <= 1
+
+        magnitudes, phases = self.stft_fn.transform(y)
+        magnitudes = magnitudes.data
+        return self.spec_to_mel(magnitudes)
+
+    def griffin_lim(self, mel_spectrogram, n_iters=30, momentum=0.0, lengths=None):
+        """Invert a (n_mel_channels, T) mel to (1, N) audio, or a padded (B, n_mel_channels, T) batch of mels
+        with optional (B,) frame lengths to (B, N) audio, all items at once. See utils.griffin_lim for momentum.
+        """
+        if mel_spectrogram.dim() == 2:
+            mel_spectrogram = mel_spectrogram.unsqueeze(0)
+        mel_dec = self.spectral_de_normalize(mel_spectrogram)
+        # Float cast required for fp16 training.
+        mel_dec = mel_dec.cpu().data.float()
+        spec_from_mel = torch.matmul(self.mel_basis.cpu().t(), mel_dec)
+        spec_from_mel *= 1000
+        if lengths is not None:
+            lengths = lengths.cpu()
+            spec_from_mel *= (torch.arange(spec_from_mel.size(-1)) < lengths[:, None])[
+                :, None
+            ]
+        out = griffin_lim(
+            spec_from_mel,
+            self.stft_fn,
+            n_iters=n_iters,
+            momentum=momentum,
+            lengths=lengths,
+        )
+        return out
+
+
+@lru_cache(maxsize=None)
+def get_mel_stft(**kwargs):
+    """Return a MelSTFT(**kwargs) shared by all callers in the process, e.g. for sampling with griffin_lim."""
+    return MelSTFT(**kwargs)
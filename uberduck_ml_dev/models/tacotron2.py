@@ -66,6 +66,7 @@ DEFAULTS = HParams(
     p_attention_dropout=0.1,
     p_decoder_dropout=0.1,
     p_teacher_forcing=1.0,
+    compact_inference=False,
     # attention parameters
     attention_rnn_dim=1024,
     attention_dim=128,
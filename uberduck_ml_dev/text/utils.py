@@ -18,6 +18,8 @@ __all__ = [
     "english_to_arpabet",
     "cleaned_text_to_sequence",
     "text_to_sequence",
+    "text_to_alternatives",
+    "sample_alternatives",
     "sequence_to_text",
     "BATCH_CLEANERS",
     "CLEANERS",
@@ -42,9 +44,11 @@ hyperparameter. Some cleaners are English-specific. You'll typically want to use
 
 
 import re
+from functools import lru_cache
 from typing import List
 
 from g2p_en import G2p
+import numpy as np
 from phonemizer import phonemize
 from unidecode import unidecode
 import torch
@@ -350,6 +354,93 @@ def text_to_sequence(
     return sequence
 
 
+# NOTE: lives in every loader worker, so it keeps only the most recently used words, as data.Data does for transcripts.
+ARPABET_CACHE_SIZE = 10000
+
+
+@lru_cache(maxsize=ARPABET_CACHE_SIZE)
+def _word_to_arpabet(word):
+    return convert_to_arpabet(word)
+
+
+def _word_to_sequence(word, symbol_set):
+    if word.startswith("{"):
+        return arpabet_to_sequence(word, symbol_set)
+    return symbols_to_sequence(word, symbol_set)
+
+
+def text_to_alternatives(
+    text,
+    cleaner_names,
+    symbol_set=DEFAULT_SYMBOLS,
+    arpabet_overrides=None,
+    with_arpabet=True,
+):
+    """Precomputes the cleaned words of text_to_sequence with both of their token ID arrays.
+    Args:
+      text: string to convert, optionally with ARPAbet sequences enclosed in curly braces
+      cleaner_names: names of the cleaner functions to run the text through
+      with_arpabet: False to skip g2p when the alternatives are only sampled with p_arpabet=0
+    Returns:
+      List of (graphemes, arpabet, is_word) tuples, graphemes and arpabet being int64 arrays of token IDs.
+      arpabet is None for non-words and embedded ARPAbet, which have a single form, and for words without with_arpabet.
+    """
+    alternatives = []
+
+    # NOTE: this mirrors text_to_sequence, including the recursion on the text before curly braces.
+    while len(text):
+        m = curly_re.match(text)
+        if not m:
+            cleaned = clean_text(text, cleaner_names)
+            for w, nw in words_re.findall(cleaned):
+                word = w or nw
+                graphemes = np.array(
+                    _word_to_sequence(word, symbol_set), dtype=np.int64
+                )
+                arpabet = None
+                if w and with_arpabet:
+                    if arpabet_overrides is None:
+                        arpabet = _word_to_arpabet(w)
+                    else:
+                        arpabet = convert_to_arpabet(w, overrides=arpabet_overrides)
+                    arpabet = np.array(
+                        arpabet_to_sequence(arpabet, symbol_set), dtype=np.int64
+                    )
+                alternatives.append((graphemes, arpabet, bool(w)))
+            break
+        cleaned = clean_text(m.group(1), cleaner_names)
+        alternatives += text_to_alternatives(
+            cleaned, cleaner_names, symbol_set, with_arpabet=with_arpabet
+        )
+        alternatives.append(
+            (
+                np.array(arpabet_to_sequence(m.group(2), symbol_set), dtype=np.int64),
+                None,
+                False,
+            )
+        )
+        text = m.group(3)
+
+    return alternatives
+
+
+def sample_alternatives(alternatives, p_arpabet=0.0):
+    """Samples a sequence of IDs from text_to_alternatives with the same distribution as text_to_sequence.
+    Each word is converted to ARPAbet with probability p_arpabet, drawing from random as text_to_sequence does.
+    """
+    sequence = []
+    for graphemes, arpabet, is_word in alternatives:
+        # NOTE: draw for every word, even with a single form, so seeded runs match text_to_sequence.
+        if is_word and random.random() < p_arpabet:
+            assert arpabet is not None, "alternatives were computed without ARPAbet"
+            sequence.append(arpabet)
+        else:
+            sequence.append(graphemes)
+    if not sequence:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(sequence)
+
+
 def pad_sequences(batch):
     input_lengths = torch.LongTensor([len(x) for x in batch])
     max_input_len = input_lengths.max()
@@ -516,7 +607,7 @@ UTTERANCES = [
     "I'm just like my country. I'm young, scrappy, and hungry, and I am not throwing away my shot.",
     "I'm still a piece of garbage.",
     "Looks like you're the first one here! Use the people tab on your watch to invite your friends to join you!",
-    "Four score and seven years ago our fathers brought forth on this continent, a new nation, conceived in Liberty, and dedicated to the proposition that all men are created equal. Now we are engaged in a great civil war, testing whether that nation, or any nation so conceived and so dedicated, can long endure. We are met on a great battle-field of that war. We have come to dedicate a portion of that field, as a final resting place for those who here gave their lives that that nation might live. It is altogether fitting and proper that we should do this. But, in a larger sense, we can not dedicate—we can not consecrate—we can not hallow—this ground. The brave men, living and dead, who struggled here, have consecrated it, far above our poor power to add or detract. The world will little note, nor long remember what we say here, but it can never forget what they did here. It is for us the living, rather, to be dedicated here to the unfinished work which they who fought here have thus far so nobly advanced. It is rather for us to be here dedicated to the great task remaining before us—that from these honored dead we take increased devotion to that cause for which they gave the last full measure of devotion—that we here highly resolve that these dead shall not have died in vain—that this nation, under God, shall have a new birth of freedom—and that government of the people, by the people, for the people, shall not perish from the earth."
+    "Four score and seven years ago our fathers brought forth on this continent, a new nation, conceived in Liberty, and dedicated to the proposition that all men are created equal. Now we are engaged in a great civil war, testing whether that nation, or any nation so conceived and so dedicated, can long endure. We are met on a great battle-field of that war. We have come to dedicate a portion of that field, as a final resting place for those who here gave their lives that that nation might live. It is altogether fitting and proper that we should do this. But, in a larger sense, we can not dedicate—we can not consecrate—we can not hallow—this ground. The brave men, living and dead, who struggled here, have consecrated it, far above our poor power to add or detract. The world will little note, nor long remember what we say here, but it can never forget what they did here. It is for us the living, rather, to be dedicated here to the unfinished work which they who fought here have thus far so nobly advanced. It is rather for us to be here dedicated to the great task remaining before us—that from these honored dead we take increased devotion to that cause for which they gave the last full measure of devotion—that we here highly resolve that these dead shall not have died in vain—that this nation, under God, shall have a new birth of freedom—and that government of the people, by the people, for the people, shall not perish from the earth.",
 ]
 
 
@@ -11,7 +11,7 @@ from tensorboardX import SummaryWriter
 import numpy as np
 import time
 
-from ..models.common import MelSTFT
+from ..models.spectral import get_mel_stft
 from ..vocoders.hifigan import HiFiGanGenerator
 from ..models.base import DEFAULTS as MODEL_DEFAULTS
 from ..vendor.tfcompat.hparam import HParams
@@ -46,10 +46,14 @@ class TTSTrainer:
         self.ignore_layers = hparams.ignore_layers
         self.grad_clip_thresh = hparams.grad_clip_thresh
         self.steps_per_sample = hparams.steps_per_sample
+        self.griffin_lim_iters = hparams.griffin_lim_iters
+        self.griffin_lim_momentum = hparams.griffin_lim_momentum
         self.cudnn_enabled = hparams.cudnn_enabled
         self.is_validate = hparams.is_validate
         self.num_workers = hparams.num_workers
         self.pin_memory = hparams.pin_memory
+        self.persistent_workers = hparams.persistent_workers
+        self.prefetch_factor = hparams.prefetch_factor
         self.lr_decay_start = hparams.lr_decay_start
         self.lr_decay_rate = hparams.lr_decay_rate
         self.lr_decay_min = hparams.lr_decay_min
@@ -94,6 +98,25 @@ class TTSTrainer:
         )
         torch.cuda.set_device(self.rank)
 
+    @property
+    def loader_device(self):
+        # NOTE: batches go wherever the model goes, which is only cuda when cudnn_enabled.
+        if self.device == "cuda" and self.cudnn_enabled:
+            return "cuda"
+        return "cpu"
+
+    @property
+    def loader_args(self):
+        args = {
+            "num_workers": self.num_workers,
+            "pin_memory": self.pin_memory and self.loader_device == "cuda",
+        }
+        # NOTE: DataLoader rejects these without worker processes.
+        if self.num_workers > 0:
+            args["persistent_workers"] = self.persistent_workers
+            args["prefetch_factor"] = self.prefetch_factor
+        return args
+
     def save_checkpoint(self, checkpoint_name, **kwargs):
         if self.rank is not None and self.rank != 0:
             return
@@ -131,13 +154,17 @@ class TTSTrainer:
     def sample(self, mel, algorithm="griffin-lim", **kwargs):
         """Invert the mel spectrogram and return the resulting audio.
 
-        audio -> (1, N)
+        audio -> (1, N), or (B, N) for a (B, n_mel_channels, T) batch of mels with griffin-lim.
         """
         if self.rank is not None and self.rank != 0:
             return
         if algorithm == "griffin-lim":
-            mel_stft = MelSTFT()
-            audio = mel_stft.griffin_lim(mel)
+            mel_stft = get_mel_stft()
+            audio = mel_stft.griffin_lim(
+                mel,
+                n_iters=self.griffin_lim_iters,
+                momentum=self.griffin_lim_momentum,
+            )
         elif algorithm == "hifigan":
             assert kwargs["hifigan_config"], "hifigan_config must be set"
             assert kwargs["hifigan_checkpoint"], "hifigan_checkpoint must be set"
@@ -195,6 +222,9 @@ DEFAULTS = HParams(
     batch_size=16,
     fp16_run=False,
     steps_per_sample=100,
+    # NOTE: with griffin_lim_momentum=0.99 (fast Griffin-Lim), about 10 iterations match 30 plain ones.
+    griffin_lim_iters=30,
+    griffin_lim_momentum=0.0,
     weight_decay=1e-6,
     sample_inference_speaker_ids=None,
     sample_inference_text="That quick beige fox jumped in the air loudly over the thin dog fence.",
@@ -208,6 +238,8 @@ DEFAULTS = HParams(
     distributed_run=False,
     num_workers=1,
     pin_memory=True,
+    persistent_workers=True,
+    prefetch_factor=2,
     lr_decay_start=15000,
     lr_decay_rate=216000,
     lr_decay_min=1e-5,
@@ -14,6 +14,7 @@ from torch.utils.data import DistributedSampler, DataLoader
 import torch.multiprocessing as mp
 from torch.distributed import init_process_group
 from torch.nn.parallel import DistributedDataParallel
+from ..data.audio_cache import SharedAudioCache
 from ..data.hifigan import MelDataset, mel_spectrogram, get_dataset_filelist
 from ..vocoders.hifigan import Generator, MultiPeriodDiscriminator, MultiScaleDiscriminator, feature_loss, generator_loss,\
     discriminator_loss
@@ -81,24 +82,36 @@ def train(rank, a, h, warm_start):
 
     training_filelist, validation_filelist = get_dataset_filelist(a)
 
+    # NOTE: created before the loader so that every worker shares it.
+    audio_cache = SharedAudioCache(h.audio_cache_bytes) if h.get("audio_cache_bytes") else None
     trainset = MelDataset(training_filelist, h.segment_size, h.n_fft, h.num_mels,
                         h.hop_size, h.win_size, h.sampling_rate, h.fmin, h.fmax, n_cache_reuse=0,
                         shuffle=False if h.num_gpus > 1 else True, fmax_loss=h.fmax_for_loss, device=device,
-                        fine_tuning=a.fine_tuning, base_mels_path=a.input_mels_dir)
+                        fine_tuning=a.fine_tuning, base_mels_path=a.input_mels_dir,
+                        peak_table=getattr(a, "input_peak_table", None), audio_cache=audio_cache)
 
     train_sampler = DistributedSampler(trainset) if h.num_gpus > 1 else None
 
+    batch_size = h.batch_size
+    if h.get("max_samples_per_batch"):
+        batch_size = max(1, h.max_samples_per_batch // h.segment_size)
+
+    # Persistent workers keep the next epoch from waiting on worker startup.
+    loader_args = {}
+    if h.num_workers > 0:
+        loader_args = dict(persistent_workers=True, prefetch_factor=h.get("prefetch_factor", 2))
     train_loader = DataLoader(trainset, num_workers=h.num_workers, shuffle=False,
                             sampler=train_sampler,
-                            batch_size=h.batch_size,
+                            batch_size=batch_size,
                             pin_memory=True,
-                            drop_last=True)
+                            drop_last=True,
+                            **loader_args)
 
     if rank == 0:
         validset = MelDataset(validation_filelist, h.segment_size, h.n_fft, h.num_mels,
                             h.hop_size, h.win_size, h.sampling_rate, h.fmin, h.fmax, False, False, n_cache_reuse=0,
                             fmax_loss=h.fmax_for_loss, device=device, fine_tuning=a.fine_tuning,
-                            base_mels_path=a.input_mels_dir)
+                            base_mels_path=a.input_mels_dir, peak_table=getattr(a, "input_peak_table", None))
         validation_loader = DataLoader(validset, num_workers=1, shuffle=False,
                                     sampler=None,
                                     batch_size=1,
@@ -120,11 +133,7 @@ def train(rank, a, h, warm_start):
         if h.num_gpus > 1:
             train_sampler.set_epoch(epoch)
 
-        processedData = []
-        for batch in train_loader:
-            processedData.append(batch)
-            
-        for i, batch in enumerate(processedData):
+        for i, batch in enumerate(train_loader):
             if rank == 0:
                 start_b = time.time()
             x, y, _, y_mel = batch
@@ -235,4 +244,6 @@ def train(rank, a, h, warm_start):
         scheduler_d.step()
         
         if rank == 0:
+            if audio_cache is not None:
+                print('Audio cache hit rate: {:4.3f}'.format(audio_cache.hit_rate))
             print('Time taken for epoch {} is {} sec\n'.format(epoch + 1, int(time.time() - start)))
\ No newline at end of file
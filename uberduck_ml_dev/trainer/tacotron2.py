@@ -10,6 +10,14 @@ from torch.utils.data.distributed import DistributedSampler
 from speechbrain.pretrained import EncoderClassifier
 
 from ..data.collate import Collate
+from ..data.loader import DevicePrefetcher
+from ..data.batched_mel import BatchedMel
+from ..data.streaming import StreamingData
+from ..data.sampler import (
+    BucketBatchSampler,
+    FrameBudgetBatchSampler,
+    WeightedSampler,
+)
 from ..models.tacotron2 import Tacotron2
 from ..utils.plot import save_figure_to_numpy
 from ..utils.utils import reduce_tensor
@@ -56,15 +64,28 @@ class Tacotron2Trainer(TTSTrainer):
         self.hop_length = self.hparams.hop_length
         self.win_length = self.hparams.win_length
         self.max_wav_value = self.hparams.max_wav_value
+        self.load_mels = self.hparams.load_mels
+        self.mel_cache_path = self.hparams.mel_cache_path
+        self.batch_mels = self.hparams.batch_mels
         self.sample_inference_text = self.hparams.sample_inference_text
         self.lr_decay_start = self.hparams.lr_decay_start
         self.lr_decay_rate = self.hparams.lr_decay_rate
         self.lr_decay_min = self.hparams.lr_decay_min
+        self.bucket_by_length = self.hparams.bucket_by_length
+        self.n_batches_per_bucket = self.hparams.n_batches_per_bucket
+        self.max_frames_per_batch = self.hparams.max_frames_per_batch
+        self.n_collate_buffers = self.hparams.n_collate_buffers
+        self.training_archives = self.hparams.training_archives
+        self.oversample_weights = self.hparams.oversample_weights
+        self.samples_per_epoch = self.hparams.samples_per_epoch
+        self.shuffle_buffer_size = self.hparams.shuffle_buffer_size
         # NOTE (Sam): there is ambiguity in naming and loading of model arguments.
         # TODO (Sam): move naming to load / get / return / (with = has) etc. convention.
         self.has_audio_encoder = self.hparams.audio_encoder_path is not None
         self.with_f0s = self.hparams.with_f0s
         self.load_f0s = self.hparams.load_f0s
+        self.f0_cache_path = self.hparams.f0_cache_path
+        self.pitch_backend = self.hparams.pitch_backend
         self.load_gsts = self.hparams.load_gsts
         self.with_gsts = (
             self.hparams.with_gsts
@@ -166,8 +187,12 @@ class Tacotron2Trainer(TTSTrainer):
             alignment_diagonalness = alignment_metrics["diagonalness"]
             alignment_max = alignment_metrics["max"]
             sample_idx = randint(0, y_pred["mel_outputs_postnet"].size(0) - 1)
-            audio = self.sample(mel=y_pred["mel_outputs_postnet"][sample_idx])
-            audio_target = self.sample(mel=mel_target[sample_idx])
+            audios = self.sample(
+                mel=torch.stack(
+                    [y_pred["mel_outputs_postnet"][sample_idx], mel_target[sample_idx]]
+                )
+            )
+            audio, audio_target = (None, None) if audios is None else audios.split(1)
             self.log(
                 "AlignmentDiagonalness/train",
                 self.global_step,
@@ -347,9 +372,13 @@ class Tacotron2Trainer(TTSTrainer):
         alignment_metrics = get_alignment_metrics(y_pred["alignments"])
         alignment_diagonalness = alignment_metrics["diagonalness"]
         alignment_max = alignment_metrics["max"]
-        sample_idx = randint(0, self.batch_size)
-        audio = self.sample(mel=y_pred["mel_outputs_postnet"][sample_idx])
-        audio_target = self.sample(mel=X["mel_padded"][sample_idx])
+        sample_idx = randint(0, y_pred["mel_outputs_postnet"].size(0) - 1)
+        audios = self.sample(
+            mel=torch.stack(
+                [y_pred["mel_outputs_postnet"][sample_idx], X["mel_padded"][sample_idx]]
+            )
+        )
+        audio, audio_target = (None, None) if audios is None else audios.split(1)
         self.log(
             "AlignmentDiagonalness/val", self.global_step, scalar=alignment_diagonalness
         )
@@ -395,24 +424,86 @@ class Tacotron2Trainer(TTSTrainer):
         )
 
     def initialize_loader(self):
-        train_set = Data(
-            **self.training_dataset_args,
-            debug=self.debug,
-            debug_dataset_size=self.batch_size,
-        )
+        if self.training_archives and self.oversample_weights:
+            raise ValueError(
+                "oversample_weights is not supported with training_archives, since streamed samples can't be reweighted"
+            )
+        if self.training_archives and (
+            self.max_frames_per_batch or self.bucket_by_length or self.samples_per_epoch
+        ):
+            raise ValueError(
+                "max_frames_per_batch, bucket_by_length and samples_per_epoch are not supported with training_archives, "
+                "since streamed samples can't be length-sorted or counted up front"
+            )
+        if self.training_archives:
+            args = dict(**self.training_dataset_args)
+            del args["audiopaths_and_text"]
+            train_set = StreamingData(
+                self.training_archives,
+                shuffle_buffer_size=self.shuffle_buffer_size,
+                seed=self.seed,
+                **args,
+            )
+        else:
+            train_set = Data(
+                **self.training_dataset_args,
+                debug=self.debug,
+                debug_dataset_size=self.batch_size,
+            )
         val_set = Data(
             **self.val_dataset_args,
             debug=self.debug,
             debug_dataset_size=self.batch_size,
         )
         collate_fn = Collate(**self.collate_args)
+        weights = None
+        if self.oversample_weights:
+            weights = train_set.get_sample_weights()
+        elif self.samples_per_epoch:
+            weights = np.ones(len(train_set))
         sampler = None
-        train_loader = DataLoader(
-            train_set,
-            batch_size=self.batch_size,
-            shuffle=(sampler is None),
-            sampler=sampler,
-            collate_fn=collate_fn,
+        batch_sampler = None
+        if self.max_frames_per_batch:
+            batch_sampler = FrameBudgetBatchSampler(
+                train_set.get_mel_lengths(),
+                max_frames=self.max_frames_per_batch,
+                seed=self.seed,
+                weights=weights,
+                num_samples=self.samples_per_epoch,
+            )
+        elif self.bucket_by_length:
+            batch_sampler = BucketBatchSampler(
+                train_set.get_mel_lengths(),
+                batch_size=self.batch_size,
+                n_batches_per_bucket=self.n_batches_per_bucket,
+                seed=self.seed,
+                weights=weights,
+                num_samples=self.samples_per_epoch,
+            )
+        elif weights is not None:
+            sampler = WeightedSampler(
+                weights, num_samples=self.samples_per_epoch, seed=self.seed
+            )
+
+        if batch_sampler is not None:
+            train_loader = DataLoader(
+                train_set,
+                batch_sampler=batch_sampler,
+                collate_fn=collate_fn,
+                **self.loader_args,
+            )
+            sampler = batch_sampler
+        else:
+            train_loader = DataLoader(
+                train_set,
+                batch_size=self.batch_size,
+                shuffle=sampler is None and not self.training_archives,
+                sampler=sampler,
+                collate_fn=collate_fn,
+                **self.loader_args,
+            )
+        train_loader = DevicePrefetcher(
+            train_loader, self.loader_device, transform=self.batch_transform
         )
         return train_set, val_set, train_loader, sampler, collate_fn
 
@@ -449,6 +540,11 @@ class Tacotron2Trainer(TTSTrainer):
 
         start_time, previous_start_time = time.perf_counter(), time.perf_counter()
         for epoch in range(start_epoch, self.epochs):
+            if sampler is not None:
+                sampler.set_epoch(epoch)
+            if isinstance(train_set, StreamingData):
+                train_set.set_epoch(epoch)
+            n_batches = len(train_loader)
             for batch_idx, batch in enumerate(train_loader):
                 self.global_step += 1
 
@@ -522,7 +618,7 @@ class Tacotron2Trainer(TTSTrainer):
                 )
                 previous_start_time = start_time
                 start_time = time.perf_counter()
-                log_str = f"epoch: {epoch}/{self.epochs} | batch: {batch_idx}/{len(train_loader)} | loss: {reduced_loss:.3f} | mel: {reduced_mel_loss:.3f} | gate: {reduced_gate_loss:.3f} | t: {start_time - previous_start_time:.3f}s | w: {(time.perf_counter() - train_start_time)/(60*60):.3f}h"
+                log_str = f"epoch: {epoch}/{self.epochs} | batch: {batch_idx}/{n_batches} | loss: {reduced_loss:.3f} | mel: {reduced_mel_loss:.3f} | gate: {reduced_gate_loss:.3f} | t: {start_time - previous_start_time:.3f}s | w: {(time.perf_counter() - train_start_time)/(60*60):.3f}h"
                 if self.distributed_run:
                     log_str += f" | rank: {self.rank}"
                 print(log_str)
@@ -582,7 +678,10 @@ class Tacotron2Trainer(TTSTrainer):
                 batch_size=self.batch_size,
                 collate_fn=collate_fn,
                 num_workers=self.num_workers,
-                pin_memory=self.pin_memory,
+                pin_memory=self.loader_args["pin_memory"],
+            )
+            val_loader = DevicePrefetcher(
+                val_loader, self.loader_device, transform=self.batch_transform
             )
             # TODO (Sam): train loop should be in base trainer.
             for step_counter, batch in enumerate(val_loader):
@@ -674,6 +773,7 @@ class Tacotron2Trainer(TTSTrainer):
     def training_dataset_args(self):
         return {
             "audiopaths_and_text": self.training_audiopaths_and_text,
+            "oversample_weights": self.oversample_weights,
             # Text parameters
             "return_texts": True,
             "text_cleaners": self.text_cleaners,
@@ -689,22 +789,43 @@ class Tacotron2Trainer(TTSTrainer):
             "hop_length": self.hop_length,
             "win_length": self.win_length,
             "max_wav_value": self.max_wav_value,
+            "load_mels": self.load_mels,
+            "mel_cache_path": self.mel_cache_path,
+            "batch_mels": self.batch_mels,
             # Speaker embedding parameters
             "audio_encoder_forward": self.audio_encoder_forward,
             "speaker_embeddings": self.speaker_embeddings,
             # F0 parameters
             "return_f0s": self.with_f0s,
             "load_f0s": self.load_f0s,
+            "f0_cache_path": self.f0_cache_path,
+            "pitch_backend": self.pitch_backend,
             # GST parameters
             "return_gsts": self.with_gsts,
             "load_gsts": self.load_gsts,
             "get_gst": self.get_gst,
         }
 
+    @property
+    def batch_transform(self):
+        if not self.batch_mels:
+            return None
+        return BatchedMel(
+            filter_length=self.filter_length,
+            hop_length=self.hop_length,
+            win_length=self.win_length,
+            n_mel_channels=self.n_mel_channels,
+            sampling_rate=self.sampling_rate,
+            mel_fmin=self.mel_fmin,
+            mel_fmax=self.mel_fmax,
+        )
+
     @property
     def collate_args(self):
         return {
-            "cudnn_enabled": self.cudnn_enabled,
+            # NOTE: reusable buffers are only safe when collating in the main process.
+            "n_buffers": self.n_collate_buffers if self.num_workers == 0 else 0,
+            "pin_memory": self.loader_args["pin_memory"],
         }
 
 
@@ -713,7 +834,20 @@ config.update(TACOTRON2_DEFAULTS.values())
 config.update(
     {
         "load_f0s": False,
+        "f0_cache_path": None,
+        "pitch_backend": "pyin",
         "load_gsts": False,
+        "load_mels": False,
+        "mel_cache_path": None,
+        "batch_mels": False,
+        "bucket_by_length": False,
+        "n_batches_per_bucket": 50,
+        "max_frames_per_batch": None,
+        "n_collate_buffers": 0,
+        "training_archives": None,
+        "oversample_weights": None,
+        "samples_per_epoch": None,
+        "shuffle_buffer_size": 1000,
         "with_f0s": False,
         "with_gsts": False,
         "get_gst": None,
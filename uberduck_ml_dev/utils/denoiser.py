@@ -17,11 +17,27 @@ audio_denoised = denoiser(audio.view(1, -1), strength=15)[:, 0] # Change strengt
 audio_denoised = audio_denoised.cpu().detach().numpy().reshape(-1)
 normalize = (32768.0 / np.max(np.abs(audio_denoised))) ** 0.9
 audio_denoised = audio_denoised * normalize
+
+Streaming, e.g. behind a vocoder that produces audio in chunks:
+stream = denoiser.stream(strength=15)
+for chunk in audio_chunks: # (1, n) tensors of any size
+    play(stream(chunk))
+play(stream.flush())
 """
 
+import os
 import sys
+from collections import OrderedDict
 import torch
+import torch.nn.functional as F
 from ..models.common import STFT
+from ..models.spectral import stft_window
+from .utils import window_sumsquare_torch
+
+# NOTE: bias spectrograms of the most recently used (checkpoint, mode, filter_length, n_overlap, win_length),
+# so only the first Denoiser of a checkpoint runs the vocoder.
+BIAS_SPEC_CACHE_SIZE = 8
+_bias_specs = OrderedDict()
 
 
 class Denoiser(torch.nn.Module):
@@ -31,19 +47,39 @@ class Denoiser(torch.nn.Module):
         self, hifigan, filter_length=1024, n_overlap=4, win_length=1024, mode="zeros"
     ):
         super(Denoiser, self).__init__()
+        self.filter_length = filter_length
+        self.hop_length = int(filter_length / n_overlap)
+        self.win_length = win_length
         self.stft = STFT(
             filter_length=filter_length,
-            hop_length=int(filter_length / n_overlap),
+            hop_length=self.hop_length,
             win_length=win_length,
             device=torch.device("cpu"),
         )
 
+        if mode not in ["zeros", "normal"]:
+            raise Exception("Mode {} if not supported".format(mode))
+        checkpoint = getattr(hifigan, "checkpoint", None)
+        key = None
+        if isinstance(checkpoint, (str, os.PathLike)):
+            key = (os.fspath(checkpoint), mode, filter_length, n_overlap, win_length)
+        if key in _bias_specs:
+            bias_spec = _bias_specs[key]
+            _bias_specs.move_to_end(key)
+        else:
+            bias_spec = self._bias_spec(hifigan, mode)
+            if key is not None:
+                _bias_specs[key] = bias_spec
+                if len(_bias_specs) > BIAS_SPEC_CACHE_SIZE:
+                    _bias_specs.popitem(last=False)
+
+        self.register_buffer("bias_spec", bias_spec.clone())
+
+    def _bias_spec(self, hifigan, mode):
         if mode == "zeros":
             mel_input = torch.zeros((1, 80, 88))
-        elif mode == "normal":
-            mel_input = torch.randn((1, 80, 88))
         else:
-            raise Exception("Mode {} if not supported".format(mode))
+            mel_input = torch.randn((1, 80, 88))
 
         with torch.no_grad():
             bias_audio = (
@@ -52,8 +88,7 @@ class Denoiser(torch.nn.Module):
                 .float()
             )
             bias_spec, _ = self.stft.transform(bias_audio.cpu())
-
-        self.register_buffer("bias_spec", bias_spec[:, :, 0][:, :, None])
+        return bias_spec[:, :, 0][:, :, None]
 
     def forward(self, audio, strength=10):
         """
@@ -66,8 +101,142 @@ class Denoiser(torch.nn.Module):
         :rtype: tensor
         """
 
-        audio_spec, audio_angles = self.stft.transform(audio.cpu())
-        audio_spec_denoised = audio_spec - self.bias_spec * strength
+        stft = STFT(
+            filter_length=self.filter_length,
+            hop_length=self.hop_length,
+            win_length=self.win_length,
+            device=audio.device,
+        )
+        audio_spec, audio_angles = stft.transform(audio)
+        audio_spec_denoised = audio_spec - self.bias_spec.to(audio.device) * strength
         audio_spec_denoised = torch.clamp(audio_spec_denoised, 0.0)
-        audio_denoised = self.stft.inverse(audio_spec_denoised.cpu(), audio_angles)
+        audio_denoised = stft.inverse(audio_spec_denoised, audio_angles)
         return audio_denoised
+
+    def stream(self, strength=10):
+        """Return a DenoiserStream that denoises audio passed to it in chunks."""
+        return DenoiserStream(self, strength=strength)
+
+
+class DenoiserStream:
+    """Chunked version of Denoiser.forward with bounded memory.
+
+    Call it with consecutive (B, n) chunks of audio of any size; it returns the denoised samples that no later
+    frame overlaps yet, about filter_length samples behind the input. flush() reflect-pads the end like the
+    offline STFT and returns the rest. The frames are overlap-added and normalized by the window sum-square
+    as in STFT.inverse, so the concatenated output matches Denoiser.forward (up to float error) over its
+    (L // hop_length) * hop_length samples, and continues to the full input length L.
+    """
+
+    def __init__(self, denoiser, strength=10):
+        self.filter_length = denoiser.filter_length
+        self.hop_length = denoiser.hop_length
+        self.win_length = denoiser.win_length
+        self.padding = denoiser.filter_length // 2
+        self.bias = denoiser.bias_spec[:, :, 0] * strength
+        self.window = None
+        self.tail = None
+        # Input held until there is enough of it to reflect-pad the start.
+        self.pending = None
+        self.n_received = 0
+        # Padded input from frame next_frame on, and the overlap-added output from out_start on.
+        self.buffer = None
+        self.next_frame = 0
+        self.output = None
+        self.weight = None
+        self.out_start = 0
+
+    def _setup(self, audio):
+        self.window = stft_window(
+            "hann", self.win_length, self.filter_length, device=audio.device
+        )
+        self.bias = self.bias.to(audio.device)
+        n_batches = audio.size(0)
+        self.buffer = audio.new_zeros(n_batches, 0)
+        self.output = audio.new_zeros(n_batches, 0)
+        self.weight = audio.new_zeros(0)
+        self.tail = audio.new_zeros(n_batches, 0)
+
+    def __call__(self, chunk):
+        self.n_received += chunk.size(-1)
+        if self.buffer is None:
+            self.pending = (
+                chunk if self.pending is None else torch.cat([self.pending, chunk], -1)
+            )
+            if self.pending.size(-1) <= self.padding:
+                return chunk.new_zeros(chunk.size(0), 0)
+            chunk, self.pending = self.pending, None
+            self._setup(chunk)
+            left = chunk[:, 1 : self.padding + 1].flip(-1)
+            chunk = torch.cat([left, chunk], -1)
+        # The last filter_length // 2 + 1 samples of input, for the right reflect padding.
+        self.tail = torch.cat([self.tail, chunk], -1)[:, -self.padding - 1 :]
+        return self._process(chunk)
+
+    def flush(self):
+        """Return the remaining denoised audio, reflect-padding the end of the input.
+
+        Returns a (B, 0) tensor on the device of the input if it was empty, and a (1, 0) CPU tensor if the
+        stream was never called.
+        """
+        if self.buffer is None:
+            assert (
+                self.pending is None or self.pending.size(-1) == 0
+            ), "the input must be longer than filter_length // 2"
+            if self.pending is not None:
+                return self.pending.new_zeros(self.pending.size(0), 0)
+            return torch.zeros(1, 0)
+        right = self.tail[:, -self.padding - 1 : -1].flip(-1)
+        # NOTE: positions past the end of the input are complete once every frame is added.
+        return self._process(right, end=self.n_received + self.padding)
+
+    def _process(self, padded, end=None):
+        self.buffer = torch.cat([self.buffer, padded], -1)
+        n_frames = max(
+            0, (self.buffer.size(-1) - self.filter_length) // self.hop_length + 1
+        )
+        if n_frames:
+            frames = self.buffer.unfold(-1, self.filter_length, self.hop_length)[
+                :, :n_frames
+            ]
+            spec = torch.fft.rfft(frames * self.window)
+            magnitude = torch.clamp(spec.abs() - self.bias[:, None], 0.0)
+            spec = torch.polar(magnitude, spec.angle())
+            frames = torch.fft.irfft(spec, n=self.filter_length) * self.window
+            length = (n_frames - 1) * self.hop_length + self.filter_length
+            added = F.fold(
+                frames.transpose(1, 2),
+                (1, length),
+                (1, self.filter_length),
+                stride=(1, self.hop_length),
+            )[:, 0, 0]
+            offset = self.next_frame * self.hop_length - self.out_start
+            self._overlap_add(
+                added,
+                window_sumsquare_torch(self.window, n_frames, self.hop_length),
+                offset,
+            )
+            self.next_frame += n_frames
+            self.buffer = self.buffer[:, n_frames * self.hop_length :]
+
+        if end is None:
+            end = self.next_frame * self.hop_length
+        ready = end - self.out_start
+        output = self.output[:, :ready]
+        weight = self.weight[:ready]
+        output = output / torch.where(
+            weight > torch.finfo(weight.dtype).tiny, weight, torch.ones_like(weight)
+        )
+        skip = max(0, self.padding - self.out_start)
+        self.output = self.output[:, ready:]
+        self.weight = self.weight[ready:]
+        self.out_start += ready
+        return output[:, skip:]
+
+    def _overlap_add(self, added, weight, offset):
+        length = offset + added.size(-1)
+        if length > self.output.size(-1):
+            self.output = F.pad(self.output, (0, length - self.output.size(-1)))
+            self.weight = F.pad(self.weight, (0, length - self.weight.size(-1)))
+        self.output[:, offset:length] += added
+        self.weight[offset:length] += weight
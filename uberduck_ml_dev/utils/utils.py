@@ -1,6 +1,7 @@
 __all__ = [
     "load_filepaths_and_text",
     "window_sumsquare",
+    "window_sumsquare_torch",
     "griffin_lim",
     "dynamic_range_compression",
     "dynamic_range_decompression",
@@ -22,6 +23,8 @@ __all__ = [
 ]
 
 
+from functools import lru_cache
+
 import soundfile as sf
 import pandas as pd
 import torch
@@ -56,8 +59,8 @@ def window_sumsquare(
 
     Parameters
     ----------
-    window : string, tuple, number, callable, or list-like
-        Window specification, as in `get_window`
+    window : string, tuple, or number
+        Window specification, as in `scipy.signal.get_window`. It must be hashable, since the result is cached.
 
     n_frames : int > 0
         The number of analysis frames
@@ -78,41 +81,106 @@ def window_sumsquare(
     -------
     wss : np.ndarray, shape=`(n_fft + hop_length * (n_frames - 1))`
         The sum-squared envelope of the window function
+
+    The result is cached per arguments, so the returned array is shared and read-only; copy it before modifying it.
     """
-    if win_length is None:
-        win_length = n_fft
+    return _window_sumsquare(
+        window, n_frames, hop_length, win_length, n_fft, np.dtype(dtype), norm
+    )
 
-    n = n_fft + hop_length * (n_frames - 1)
-    x = np.zeros(n, dtype=dtype)
 
+def _squared_window(window, win_length, n_fft, norm):
+    if win_length is None:
+        win_length = n_fft
     # Compute the squared window at the desired length
     win_sq = get_window(window, win_length, fftbins=True)
     win_sq = librosa_util.normalize(win_sq, norm=norm) ** 2
-    win_sq = librosa_util.pad_center(win_sq, n_fft)
-
-    # Fill the envelope
-    for i in range(n_frames):
-        sample = i * hop_length
-        x[sample : min(n, sample + n_fft)] += win_sq[: max(0, min(n_fft, n - sample))]
+    return librosa_util.pad_center(win_sq, n_fft)
+
+
+@lru_cache(maxsize=256)
+def _window_sumsquare(window, n_frames, hop_length, win_length, n_fft, dtype, norm):
+    win_sq = _squared_window(window, win_length, n_fft, norm).astype(dtype)
+
+    # NOTE: overlap-add by hop sized chunks of the window, so the loop is over ceil(n_fft / hop_length)
+    # shifts instead of over the frames. Output chunk c sums window chunk j of frame c - j.
+    n_chunks = -(-n_fft // hop_length)
+    chunks = np.zeros(n_chunks * hop_length, dtype=dtype)
+    chunks[:n_fft] = win_sq
+    chunks = chunks.reshape(n_chunks, hop_length)
+    x = np.zeros((n_frames + n_chunks - 1, hop_length), dtype=dtype)
+    for j in range(n_chunks):
+        x[j : j + n_frames] += chunks[j]
+    x = x.reshape(-1)[: n_fft + hop_length * (n_frames - 1)]
+    x.flags.writeable = False
     return x
 
 
-def griffin_lim(magnitudes, stft_fn, n_iters=30):
+def window_sumsquare_torch(
+    window,
+    n_frames,
+    hop_length=200,
+    win_length=800,
+    n_fft=800,
+    dtype=torch.float32,
+    norm=None,
+    device="cpu",
+):
+    """Torch version of window_sumsquare, computed on device as the transposed convolution of the squared window
+    with n_frames ones. window is a window specification as in window_sumsquare or a (n_fft,) tensor of the
+    (zero padded) window, in which case its device is used.
+    """
+    if isinstance(window, torch.Tensor):
+        device = window.device
+        win_sq = window.to(dtype) ** 2
+    else:
+        win_sq = torch.from_numpy(_squared_window(window, win_length, n_fft, norm))
+        win_sq = win_sq.to(device, dtype)
+    ones = torch.ones(1, 1, n_frames, device=device, dtype=dtype)
+    return F.conv_transpose1d(ones, win_sq.view(1, 1, -1), stride=hop_length).view(-1)
+
+
+def griffin_lim(magnitudes, stft_fn, n_iters=30, momentum=0.0, lengths=None):
     """
     PARAMS
     ------
-    magnitudes: spectrogram magnitudes
+    magnitudes: (B, n_freq, T) spectrogram magnitudes, padded with zeros past each item's length
     stft_fn: STFT class with transform (STFT) and inverse (ISTFT) methods
-    """
+    n_iters: number of phase updates
+    momentum: with momentum > 0, use the fast Griffin-Lim update (Perraudin et al., 2013), which extrapolates
+        each phase estimate from the previous one and converges in fewer iterations. 0.99 is a good value.
+    lengths: optional (B,) number of frames of each item. The signal of each item is zeroed past its length
+        on every iteration, so padding does not leak into the estimate.
 
-    angles = np.angle(np.exp(2j * np.pi * np.random.rand(*magnitudes.size())))
-    angles = angles.astype(np.float32)
-    angles = torch.autograd.Variable(torch.from_numpy(angles))
-    signal = stft_fn.inverse(magnitudes, angles).squeeze(1)
+    RETURNS
+    -------
+    signal: (B, (T - 1) * hop_length) audio
+    """
+    assert 0 <= momentum < 1, "momentum must be in [0, 1)"
+    mask = None
+    if lengths is not None:
+        n_samples = (magnitudes.size(-1) - 1) * stft_fn.hop_length
+        sample_lengths = (lengths.to(magnitudes.device) - 1) * stft_fn.hop_length
+        mask = (
+            torch.arange(n_samples, device=magnitudes.device)[None, :]
+            < sample_lengths[:, None]
+        ).to(magnitudes.dtype)
+
+    def _inverse(angles):
+        signal = stft_fn.inverse(magnitudes, angles).squeeze(1)
+        return signal * mask if mask is not None else signal
 
+    angles = 2 * np.pi * torch.rand(magnitudes.size(), device=magnitudes.device)
+    signal = _inverse(angles)
+    previous = None
     for i in range(n_iters):
-        _, angles = stft_fn.transform(signal)
-        signal = stft_fn.inverse(magnitudes, angles).squeeze(1)
+        rebuilt = torch.polar(*stft_fn.transform(signal))
+        estimate = rebuilt
+        if momentum and previous is not None:
+            estimate = rebuilt - previous * (momentum / (1 + momentum))
+        previous = rebuilt
+        angles = estimate.angle()
+        signal = _inverse(angles)
     return signal
 
 
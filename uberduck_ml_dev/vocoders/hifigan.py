@@ -37,6 +37,7 @@ DEFAULTS = {
     "resblock": "1",
     "num_gpus": 0,
     "batch_size": 16,
+    "max_samples_per_batch": None,
     "learning_rate": 0.0002,
     "adam_b1": 0.8,
     "adam_b2": 0.99,
@@ -58,6 +59,8 @@ DEFAULTS = {
     "fmax": 8000,
     "fmax_for_loss": None,
     "num_workers": 4,
+    "prefetch_factor": 2,
+    "audio_cache_bytes": None,
     "dist_config": {
         "dist_backend": "nccl",
         "dist_url": "tcp://localhost:54321",